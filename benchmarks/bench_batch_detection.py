@@ -0,0 +1,74 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import context_video_cutter.batch_detection as batch_detection
+import context_video_cutter.embeddings as embeddings
+import context_video_cutter.ranking as ranking
+from context_video_cutter.transcript import format_srt_time
+
+# Usage: python -m benchmarks.bench_batch_detection --files 48 --cues 3000
+# Detects moments in synthetic transcripts with 1, 2, 4 ... workers and
+# reports throughput and speedup. The temporary cache and corpus
+# directories are passed on to the workers by detect_many.
+
+WORDS = (
+    "stream chat boss level game win lose funny music loud crazy team "
+    "play again never ever really good bad enemy map round clutch"
+).split()
+
+
+def make_transcripts(directory, files, cues, seed):
+    rng = random.Random(seed)
+    paths = []
+    for n in range(files):
+        path = Path(directory) / f"synthetic_{seed}_{n:03d}.srt"
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(cues):
+                text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+                text += rng.choice([".", "!", "?", "", ""])
+                start, end = i * 3000, i * 3000 + 2800
+                f.write(
+                    f"{i + 1}\n{format_srt_time(start)} --> {format_srt_time(end)}\n"
+                    f"{text}\n\n"
+                )
+        paths.append(path.as_posix())
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=48)
+    parser.add_argument("--cues", type=int, default=3000)
+    parser.add_argument("--language", default="en")
+    args = parser.parse_args()
+
+    workers_counts = [1]
+    while workers_counts[-1] * 2 <= (os.cpu_count() or 1):
+        workers_counts.append(workers_counts[-1] * 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # keep synthetic text out of the real embedding cache and corpus
+        embeddings.embeddings_config["cache_dir"] = Path(tmp, "embeddings")
+        ranking.ranking_config["model_dir"] = Path(tmp, "ranking")
+
+        baseline = None
+        print(f"{'workers':>7} {'time, s':>8} {'files/s':>8} {'speedup':>8}")
+        for workers in workers_counts:
+            # fresh texts per run, so no run is served from the cache
+            paths = make_transcripts(tmp, args.files, args.cues, seed=workers)
+            started = time.perf_counter()
+            batch_detection.detect_many(paths, args.language, workers=workers)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(
+                f"{workers:>7} {elapsed:>8.2f} {args.files / elapsed:>8.2f} "
+                f"{baseline / elapsed:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import context_video_cutter.utils as utils
+
+# Usage: python -m benchmarks.bench_daemon_first_segment path/to/clip.wav
+# Time to the first transcribed segment of a short clip: in a fresh process
+# that has to load the model, and through the worker daemon, which is
+# started here first (or already running on the configured port).
+
+COLD_RUN = """
+import sys, time
+started = time.perf_counter()
+import context_video_cutter.utils as utils
+segments, _ = utils.run_whisper(sys.argv[1], utils.get_whisper_profile(sys.argv[2]))
+next(iter(segments), None)
+print(time.perf_counter() - started)
+"""
+
+
+def first_segment_cold(clip, profile):
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_RUN, clip, profile],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def first_segment_daemon(clip, profile):
+    started = time.perf_counter()
+    first = []
+
+    def on_event(event):
+        if event["event"] == "segment" and not first:
+            first.append(time.perf_counter() - started)
+
+    request = {
+        "op": "transcribe",
+        "input": clip,
+        "profile": utils.get_whisper_profile(profile),
+    }
+    if utils.daemon_request(request, on_event) is None:
+        raise RuntimeError("worker daemon is not reachable")
+    return first[0] if first else time.perf_counter() - started
+
+
+def wait_for_daemon(timeout=600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if utils.daemon_request({"op": "ping"}) is not None:
+            return
+        time.sleep(1)
+    raise RuntimeError("worker daemon did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("clip", type=Path)
+    parser.add_argument("--profile", default="balanced")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    clip = args.clip.resolve().as_posix()
+
+    utils.daemon_config["enabled"] = True
+    daemon = None
+    if utils.daemon_request({"op": "ping"}) is None:
+        daemon = subprocess.Popen(
+            [sys.executable, "-m", "context_video_cutter.worker_daemon"]
+        )
+    try:
+        wait_for_daemon()
+        print(f"{'run':>3} {'cold, s':>8} {'daemon, s':>10}")
+        for run in range(1, args.runs + 1):
+            cold = first_segment_cold(clip, args.profile)
+            warm = first_segment_daemon(clip, args.profile)
+            print(f"{run:>3} {cold:>8.2f} {warm:>10.2f}")
+    finally:
+        if daemon:
+            daemon.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import time
+from pathlib import Path
+
+import context_video_cutter.utils as utils
+
+# Usage: python -m benchmarks.bench_whisper_profiles path/to/clip.wav
+# Reports the realtime factor (processing time / audio duration) of every
+# Whisper speed profile; lower is faster.
+
+
+def bench_profile(clip_path, name):
+    profile = utils.get_whisper_profile(name)
+    # model loading is a one-off cost, keep it out of the measurement
+    utils.get_whisper_model(profile)
+
+    started = time.perf_counter()
+    segments, info = utils.run_whisper(clip_path, profile)
+    segments_count = sum(1 for _ in segments)
+    elapsed = time.perf_counter() - started
+    return info.duration, elapsed, segments_count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("clip", type=Path)
+    parser.add_argument(
+        "--profiles", nargs="+", default=list(utils.WHISPER_PROFILES)
+    )
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'audio, s':>9} {'time, s':>8} {'RTF':>6} {'segments':>9}")
+    for name in args.profiles:
+        duration, elapsed, segments_count = bench_profile(args.clip.as_posix(), name)
+        print(
+            f"{name:<10} {duration:>9.1f} {elapsed:>8.1f} "
+            f"{elapsed / duration:>6.3f} {segments_count:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
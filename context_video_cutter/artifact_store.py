@@ -0,0 +1,296 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+import shutil
+
+import toml
+from filelock import FileLock, Timeout
+
+import context_video_cutter.config_manager as config_manager
+from context_video_cutter.manifest import Manifest
+from context_video_cutter.shared_paths import local_path
+from context_video_cutter.upload_queue import AccountLedger
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+storage_config = config.get("storage", {})
+
+MEDIA_SUFFIXES = set(
+    ".mp4 .mkv .webm .mov .avi .flv .ts .m4a .mp3 .opus .ogg .aac .flac .wav".split()
+)
+INTERMEDIATE_SUFFIXES = {".wav", ".pcm", ".npz", ".gray"}
+# left behind by a crashed ffmpeg, Whisper or yt-dlp run
+TRANSIENT_SUFFIXES = {".wav", ".pcm", ".part", ".gray"}
+# lock files of transient files in use and of running downloads
+LOCKS_DIR = ".locks"
+# sources and intermediates are evicted first, clips only after them
+EVICTION_TIERS = {"source": 0, "intermediate": 0, "clip": 1}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class ArtifactStore:
+    # Sizes and last-access times of the media files under sources/ and
+    # results/, kept in SQLite so several processes can share them.
+    def __init__(self, db_path=None):
+        self.db_path = Path(
+            db_path or BASE_DIR / storage_config.get("db", "results/artifacts.sqlite")
+        )
+        self.sources_dir = (BASE_DIR / config["paths"]["sources_dir"]).resolve()
+        self.results_dir = (BASE_DIR / config["paths"]["output_dir_base"]).resolve()
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "path TEXT PRIMARY KEY, kind TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path.as_posix(), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def classify(self, path):
+        # "source", "intermediate", "clip", or None for files not managed
+        if path.is_relative_to(self.sources_dir):
+            return "source" if path.suffix.lower() in MEDIA_SUFFIXES else None
+        if path.is_relative_to(self.results_dir):
+            if (
+                path.suffix.lower() in INTERMEDIATE_SUFFIXES
+                or path.name.startswith("section_")
+            ):
+                return "intermediate"
+            if path.suffix.lower() in MEDIA_SUFFIXES:
+                return "clip"
+        return None
+
+    def touch(self, *paths):
+        now = time.time()
+        rows = []
+        for path in paths:
+            path = Path(path).resolve()
+            kind = self.classify(path)
+            if kind and path.exists():
+                rows.append((path.as_posix(), kind, path.stat().st_size, now))
+        if not rows:
+            return
+        with self._connect() as db:
+            db.executemany(
+                "INSERT INTO artifacts (path, kind, size, last_access) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET "
+                "kind = excluded.kind, size = excluded.size, "
+                "last_access = excluded.last_access",
+                rows,
+            )
+
+    def scan(self):
+        # pick up files nobody touched yet (last access = mtime) and forget
+        # the ones deleted by hand
+        with self._connect() as db:
+            known = {
+                path: size
+                for path, size in db.execute("SELECT path, size FROM artifacts")
+            }
+            found = set()
+            for root in (self.sources_dir, self.results_dir):
+                for dirpath, _, filenames in os.walk(root):
+                    for filename in filenames:
+                        path = Path(dirpath, filename)
+                        kind = self.classify(path)
+                        if kind is None:
+                            continue
+                        stat = path.stat()
+                        found.add(path.as_posix())
+                        if path.as_posix() not in known:
+                            db.execute(
+                                "INSERT INTO artifacts VALUES (?, ?, ?, ?)",
+                                (path.as_posix(), kind, stat.st_size, stat.st_mtime),
+                            )
+                        elif known[path.as_posix()] != stat.st_size:
+                            db.execute(
+                                "UPDATE artifacts SET size = ? WHERE path = ?",
+                                (stat.st_size, path.as_posix()),
+                            )
+            db.executemany(
+                "DELETE FROM artifacts WHERE path = ?",
+                [(path,) for path in known.keys() - found],
+            )
+
+    def protected_paths(self):
+        # clips still waiting for upload in any account ledger, and the
+        # source that is selected right now
+        protected = set()
+        for account_info in config.get("accounts", {}).values():
+            for video in AccountLedger(BASE_DIR / account_info["json"]).pending():
+                path = BASE_DIR / local_path(video["video"])
+                protected.add(path.resolve().as_posix())
+        source_file = config_manager.get_source_file_path()
+        if source_file:
+            protected.add(Path(source_file).resolve().as_posix())
+        return protected
+
+    def clean_orphans(self, min_age=None):
+        # WAV / PCM / .part / raw frame files of crashed runs; a WAV recorded in its
+        # manifest is a finished intermediate and is left to evict(). Files in use
+        # and .part files of downloads still to resume are locked by their owners,
+        # in whatever process they run.
+        if min_age is None:
+            min_age = storage_config.get("orphan_age", 3600)
+        downloads_running = locked("download", min_age)
+        removed = []
+        for root in (self.sources_dir, self.results_dir):
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = Path(dirpath, filename)
+                    if path.suffix.lower() not in TRANSIENT_SUFFIXES:
+                        continue
+                    if time.time() - path.stat().st_mtime < min_age:
+                        continue
+                    if path.suffix.lower() == ".part" and downloads_running:
+                        continue
+                    if path.suffix.lower() == ".wav":
+                        recorded = Manifest(path.parent).get_path("wav")
+                        if path.is_relative_to(self.sources_dir) or (
+                            recorded and recorded.resolve() == path
+                        ):
+                            continue
+                    if locked(path_key(path), min_age):
+                        continue
+                    os.remove(path)
+                    removed.append(path)
+        with self._connect() as db:
+            db.executemany(
+                "DELETE FROM artifacts WHERE path = ?",
+                [(path.as_posix(),) for path in removed],
+            )
+        return removed
+
+    def evict(self, quota_bytes):
+        # least recently used first, sources and intermediates before clips
+        protected = self.protected_paths()
+        min_age = storage_config.get("orphan_age", 3600)
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT path, kind, size FROM artifacts ORDER BY last_access"
+            ).fetchall()
+        total = sum(size for _, _, size in rows)
+        removed = []
+        for path, kind, size in sorted(rows, key=lambda row: EVICTION_TIERS[row[1]]):
+            if total <= quota_bytes:
+                break
+            # in use by a run of this or another process
+            if path in protected or locked(path_key(path), min_age):
+                continue
+            if os.path.exists(path):
+                os.remove(path)
+            total -= size
+            removed.append(Path(path))
+        with self._connect() as db:
+            db.executemany(
+                "DELETE FROM artifacts WHERE path = ?",
+                [(path.as_posix(),) for path in removed],
+            )
+        return removed, total
+
+    def enforce_quota(self, log=print):
+        quota_gb = storage_config.get("quota_gb", 0)
+        orphans = self.clean_orphans()
+        for path in orphans:
+            log(f"Removed leftover {path.name}")
+        if not quota_gb:
+            return orphans
+        self.scan()
+        evicted, total = self.evict(int(quota_gb * 1024**3))
+        for path in evicted:
+            log(f"Evicted {path.name}")
+        log(f"Artifacts: {total / 1024**3:.1f} of {quota_gb} GB")
+        return orphans + evicted
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+
+def touch(*paths):
+    get_store().touch(*paths)
+
+
+def lock_dir():
+    path = BASE_DIR / config["paths"]["output_dir_base"] / LOCKS_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def path_key(path):
+    return hashlib.sha1(Path(path).resolve().as_posix().encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def hold(name):
+    # every holder takes a lock file of its own, so a file can be in use by
+    # several runs at once; the lock file goes with the run
+    lock_path = lock_dir() / f"{name}-{uuid.uuid4().hex}.lock"
+    try:
+        with FileLock(lock_path.as_posix()):
+            yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            # being checked by a sweep (Windows): it goes as a stale lock
+            pass
+
+
+def locked(name, min_age):
+    # True while any holder of name runs; a lock that can be taken was left
+    # by a crashed run and is removed once older than min_age
+    for lock_path in lock_dir().glob(f"{name}-*.lock"):
+        lock = FileLock(lock_path.as_posix())
+        try:
+            lock.acquire(timeout=0)
+        except Timeout:
+            return True
+        try:
+            if time.time() - lock_path.stat().st_mtime >= min_age:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        finally:
+            lock.release()
+    return False
+
+
+@contextmanager
+def in_use(path):
+    # held while a file is written or read: the sweep and evict() leave it
+    with hold(path_key(path)):
+        yield
+
+
+@contextmanager
+def downloading():
+    # held by downloads from the moment they are queued: their .part files
+    # are resumed later and are only swept while no download runs
+    with hold("download"):
+        yield
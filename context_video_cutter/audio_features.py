@@ -0,0 +1,176 @@
+import os
+from pathlib import Path
+import shutil
+
+import numpy as np
+import toml
+from slugify import slugify
+
+import context_video_cutter.artifact_store as artifact_store
+import context_video_cutter.utils as utils
+from context_video_cutter.manifest import Manifest
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+
+SAMPLE_RATE = 16000
+# one feature value per 100 ms frame
+FRAME = 1600
+FRAMES_PER_SECOND = SAMPLE_RATE // FRAME
+# 10 ms loudness envelope used to count syllable peaks
+SUBFRAME = 160
+# frames decoded from the memory map at once (60 s), keeps memory flat
+BLOCK_FRAMES = 600
+FEATURE_NAMES = ("loudness", "flux", "speech_rate")
+
+
+def decode_pcm(source_path, pcm_path, log_box=None, tk=None):
+    tmp_path = Path(pcm_path).with_suffix(".tmp.pcm")
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        Path(source_path).as_posix(),
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-f",
+        "s16le",
+        "-acodec",
+        "pcm_s16le",
+        tmp_path.as_posix(),
+    ]
+    return_code = utils.run_tool(
+        cmd, log_box, tk, resources=("cpu", "disk"), outputs=[tmp_path]
+    )
+    if return_code != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {source_path}")
+    os.replace(tmp_path, pcm_path)
+    return pcm_path
+
+
+def compute_features(pcm_path):
+    samples = np.memmap(pcm_path, dtype=np.int16, mode="r")
+    n_frames = len(samples) // FRAME
+    loudness = np.empty(n_frames, dtype=np.float32)
+    flux = np.empty(n_frames, dtype=np.float32)
+    peaks = np.empty(n_frames, dtype=np.float32)
+    window = np.hanning(FRAME).astype(np.float32)
+    prev_spectrum = None
+
+    for first in range(0, n_frames, BLOCK_FRAMES):
+        last = min(first + BLOCK_FRAMES, n_frames)
+        frames = (
+            np.asarray(samples[first * FRAME : last * FRAME], dtype=np.float32)
+            / 32768.0
+        ).reshape(-1, FRAME)
+
+        # RMS loudness in dBFS
+        rms = np.sqrt(np.mean(frames**2, axis=1))
+        loudness[first:last] = 20 * np.log10(rms + 1e-6)
+
+        # positive spectral flux between L1-normalised magnitude spectra, so
+        # it reacts to changes in timbre rather than volume
+        spectrum = np.abs(np.fft.rfft(frames * window, axis=1))
+        spectrum /= spectrum.sum(axis=1, keepdims=True) + 1e-9
+        if prev_spectrum is None:
+            prev_spectrum = spectrum[:1]
+        previous = np.concatenate((prev_spectrum, spectrum[:-1]))
+        flux[first:last] = np.maximum(spectrum - previous, 0).sum(axis=1)
+        prev_spectrum = spectrum[-1:]
+
+        # syllable nuclei: peaks of a smoothed 10 ms envelope above the block
+        # median and above -60 dBFS
+        envelope = np.sqrt(np.mean(frames.reshape(-1, SUBFRAME) ** 2, axis=1))
+        envelope = np.convolve(envelope, np.ones(5) / 5, mode="same")
+        is_peak = np.zeros(len(envelope), dtype=bool)
+        is_peak[1:-1] = (
+            (envelope[1:-1] > envelope[:-2])
+            & (envelope[1:-1] >= envelope[2:])
+            & (envelope[1:-1] > max(np.median(envelope), 1e-3))
+        )
+        peaks[first:last] = is_peak.reshape(-1, FRAME // SUBFRAME).sum(axis=1)
+
+    del samples
+    return {"loudness": loudness, "flux": flux, "speech_rate": peaks}
+
+
+def get_features(source_path, log_box=None, tk=None):
+    # features are cached next to the transcript; the PCM is only needed
+    # while they are computed
+    source_path = Path(source_path)
+    base_name = slugify(source_path.stem)
+    current_output_dir = utils.get_output_dir(source_path)
+    features_path = current_output_dir / f"{base_name}.features.npz"
+    manifest = Manifest(current_output_dir)
+    if manifest.is_fresh("features", [source_path]):
+        artifact_store.touch(features_path)
+        with np.load(features_path) as data:
+            return {name: data[name] for name in FEATURE_NAMES}
+
+    pcm_path = current_output_dir / f"{base_name}.pcm"
+    with artifact_store.in_use(pcm_path):
+        decode_pcm(source_path, pcm_path, log_box, tk)
+        try:
+            features = compute_features(pcm_path)
+        finally:
+            os.remove(pcm_path)
+    np.savez(features_path, **features)
+    manifest.record("features", features_path, [source_path])
+    artifact_store.touch(features_path)
+    return features
+
+
+def segment_features(features, segments):
+    # per-segment means from cumulative sums, one vectorised pass per feature
+    n_frames = len(features["loudness"])
+    starts = np.array([seg["start"] for seg in segments], dtype=np.int64)
+    ends = np.array([seg["end"] for seg in segments], dtype=np.int64)
+    first = np.clip(starts * FRAMES_PER_SECOND // 1000, 0, n_frames)
+    last = np.clip(ends * FRAMES_PER_SECOND // 1000, 0, n_frames)
+    length = np.maximum(last - first, 1)
+
+    result = {}
+    for name in FEATURE_NAMES:
+        cumulative = np.concatenate(
+            ([0.0], np.cumsum(features[name], dtype=np.float64))
+        )
+        result[name] = (cumulative[last] - cumulative[first]) / length
+    # peaks per frame -> syllables per second
+    result["speech_rate"] *= FRAMES_PER_SECOND
+    return result
+
+
+def zscore(values):
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return values
+    mean = values[finite].mean()
+    std = values[finite].std()
+    return (values - mean) / (std + 1e-9)
+
+
+def combine_scores(text_scores, segments, features, weights):
+    # segments the ranking time limit left unscored (-inf) are ranked last,
+    # whatever the weights: a zero text weight must not turn them into NaN
+    text_scores = np.asarray(text_scores, dtype=np.float64)
+    scored = np.isfinite(text_scores)
+    total = np.zeros(len(text_scores))
+    total[scored] = weights.get("text", 1.0) * zscore(text_scores)[scored]
+    if features is not None:
+        per_segment = segment_features(features, segments)
+        for name in FEATURE_NAMES:
+            weight = weights.get(name, 0.0)
+            if weight:
+                total += weight * zscore(per_segment[name])
+    total[~scored | ~np.isfinite(total)] = -np.inf
+    return total
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from tkinter import filedialog, messagebox
+
+import context_video_cutter.config_manager as config_manager
+import context_video_cutter.embeddings as embeddings
+import context_video_cutter.ranking as ranking
+import context_video_cutter.subtitle_processing as subtitle_processing
+import context_video_cutter.utils as utils
+
+
+def _init_worker(language, embeddings_config, ranking_config):
+    # a fresh interpreter reads config.toml again: the caller's settings
+    # (e.g. the cache and corpus dirs of a benchmark) come with the call.
+    # Every worker loads the model once, before its first file.
+    embeddings.embeddings_config.update(embeddings_config)
+    ranking.ranking_config.update(ranking_config)
+    embeddings.get_backend(language)
+
+
+def detect_moments(srt_path, language="en", threshold=0.7):
+    segments = subtitle_processing.get_interest_segments(
+        srt_path, language, threshold, update_corpus=True
+    )
+    timecodes = subtitle_processing.segments_to_timecodes(segments)
+    timecodes_path = Path(srt_path).with_suffix(".timecodes.txt")
+    with open(timecodes_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(timecodes))
+        f.close()
+    return timecodes
+
+
+def detect_many(
+    srt_paths, language="en", threshold=0.7, workers=None, on_result=None
+):
+    # Never fork the GUI process: its other threads (process manager loop,
+    # downloads) may hold locks a forked child would inherit locked.
+    # forkserver forks from a clean single-threaded server; spawn elsewhere.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+    else:
+        context = multiprocessing.get_context("spawn")
+
+    results = {}
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(language, embeddings.embeddings_config, ranking.ranking_config),
+    ) as pool:
+        futures = {
+            pool.submit(detect_moments, path, language, threshold): path
+            for path in srt_paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = e
+            if on_result:
+                on_result(path, results[path])
+    return results
+
+
+def detect_selected_files(label, log_box, tk):
+    srt_paths = filedialog.askopenfilenames(filetypes=[("SRT Files", "*.srt")])
+    if not srt_paths:
+        return
+    language = config_manager.get_language()
+
+    def on_result(path, result):
+        if isinstance(result, Exception):
+            utils.log_message(f"ERROR: {Path(path).name}: {result}", log_box, tk)
+        else:
+            utils.log_message(
+                f"{Path(path).name}: {len(result)} moments", log_box, tk
+            )
+
+    def worker():
+        label.config(text=f"Processing {len(srt_paths)} files…", foreground="blue")
+        try:
+            results = detect_many(srt_paths, language, on_result=on_result)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            label.config(text="Error", foreground="red")
+            return
+        failed = sum(isinstance(result, Exception) for result in results.values())
+        label.config(
+            text=f"Done: {len(results) - failed}, failed: {failed}",
+            foreground="green" if not failed else "red",
+        )
+
+    threading.Thread(target=worker, daemon=True).start()
@@ -0,0 +1,109 @@
+import threading
+import time
+from pathlib import Path
+from tkinter import ttk
+
+COLUMNS = {
+    "status": ("Status", 110),
+    "progress": ("Progress", 70),
+    "duration": ("Duration", 80),
+    "size": ("Size", 80),
+    "elapsed": ("Elapsed", 70),
+}
+FLUSH_INTERVAL_MS = 100
+RUNNING_STATUSES = {"Cutting", "Subtitles", "Burning"}
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_size(size):
+    return f"{size / 1024**2:.1f} MB"
+
+
+class ClipTable:
+    # One Treeview row per clip, filled once. Worker threads only record
+    # changes; the Tk thread applies the latest value of every changed cell
+    # on a timer, so a burst of updates costs one redraw per cell.
+    def __init__(self, parent, height=10):
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(
+            self.frame, columns=list(COLUMNS), height=height, show="tree headings"
+        )
+        self.tree.heading("#0", text="Clip")
+        self.tree.column("#0", width=160, stretch=True)
+        for column, (title, width) in COLUMNS.items():
+            self.tree.heading(column, text=title)
+            self.tree.column(column, width=width, anchor="e", stretch=False)
+        scrollbar = ttk.Scrollbar(
+            self.frame, orient="vertical", command=self.tree.yview
+        )
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        self.lock = threading.Lock()
+        self.new_rows = None
+        self.changes = {}
+        self.started = {}
+        self.tree.after(FLUSH_INTERVAL_MS, self._flush)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def set_clips(self, clips):
+        # clips: [{"filename", "duration" (seconds or None)}, ...]
+        rows = [
+            (
+                Path(clip["filename"]).name,
+                "" if clip["duration"] is None else format_duration(clip["duration"]),
+            )
+            for clip in clips
+        ]
+        with self.lock:
+            self.new_rows = rows
+            self.changes = {}
+            self.started = {}
+
+    def update(self, index, status=None, progress=None, size=None):
+        with self.lock:
+            row = self.changes.setdefault(index, {})
+            if status is not None:
+                row["status"] = status
+                if status in RUNNING_STATUSES:
+                    self.started.setdefault(index, time.monotonic())
+                elif index in self.started:
+                    row["elapsed"] = format_duration(
+                        time.monotonic() - self.started.pop(index)
+                    )
+            if progress is not None:
+                row["progress"] = f"{min(progress, 100):.0f}%"
+            if size is not None:
+                row["size"] = format_size(size)
+
+    def _flush(self):
+        with self.lock:
+            new_rows, self.new_rows = self.new_rows, None
+            changes, self.changes = self.changes, {}
+            now = time.monotonic()
+            for index, started in self.started.items():
+                changes.setdefault(index, {})["elapsed"] = format_duration(
+                    now - started
+                )
+        if new_rows is not None:
+            self.tree.delete(*self.tree.get_children())
+            for index, (name, duration) in enumerate(new_rows):
+                self.tree.insert(
+                    "",
+                    "end",
+                    iid=str(index),
+                    text=name,
+                    values=("Not started", "", duration, "", ""),
+                )
+        for index, row in changes.items():
+            if self.tree.exists(str(index)):
+                for column, value in row.items():
+                    self.tree.set(str(index), column, value)
+        self.tree.after(FLUSH_INTERVAL_MS, self._flush)
@@ -18,6 +18,8 @@ source_filepath = _raw["default"]["source_file_path"]
 subs_filepath = _raw["default"]["subs_file_path"]
 timecodes = _raw["default"]["timecodes"]
 clips_json_path = _raw["default"]["clips_json_path"]
+source_url = _raw["default"].get("source_url", "")
+whisper_profile = _raw.get("whisper", {}).get("profile", "balanced")
 
 account_jsons = {
     name: {
@@ -58,6 +60,16 @@ def set_clips_json_path(path):
     clips_json_path = path
 
 
+def set_source_url(url):
+    global source_url
+    source_url = url
+
+
+def set_whisper_profile(profile):
+    global whisper_profile
+    whisper_profile = profile
+
+
 def get_source_file_path():
     return source_filepath
 
@@ -80,3 +92,11 @@ def get_timecodes():
 
 def get_clips_json_path():
     return clips_json_path
+
+
+def get_source_url():
+    return source_url
+
+
+def get_whisper_profile():
+    return whisper_profile
@@ -0,0 +1,284 @@
+import json
+import math
+import os
+import re
+from pathlib import Path
+import shutil
+from tkinter import messagebox
+
+import numpy as np
+import toml
+
+import context_video_cutter.artifact_store as artifact_store
+import context_video_cutter.config_manager as config_manager
+import context_video_cutter.process_manager as process_manager
+import context_video_cutter.utils as utils
+from context_video_cutter.manifest import Manifest
+from context_video_cutter.shared_paths import local_path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+covers_config = config.get("covers", {})
+
+SHOWINFO_LINE = re.compile(r"pts_time:\s*(-?[\d.]+).*?\bs:(\d+)x(\d+)")
+CONTACT_SHEET_NAME = "contact_sheet.jpg"
+# candidates scored at a time, so a long set never sits in memory as floats
+SCORE_CHUNK = 256
+
+
+def scan_candidates(input_path, ranges, raw_path, step, width, log_box, tk):
+    # One decode pass over the input: a select filter keeps a frame every
+    # step seconds inside any of the ranges, showinfo reports its time and
+    # the small grayscale frames are written to raw_path.
+    # Returns (times, frames) with frames an (n, h, w) uint8 memmap.
+    first = min(start for start, _ in ranges)
+    last = max(end for _, end in ranges)
+    # input seeking restarts timestamps at 0, so the ranges move with it
+    in_range = "+".join(
+        f"between(t,{start - first:.3f},{end - first:.3f})" for start, end in ranges
+    )
+    sample = f"isnan(prev_selected_t)+gte(t-prev_selected_t,{step})"
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-hide_banner",
+        "-nostats",
+        "-ss",
+        utils.format_timecode(first),
+        "-to",
+        utils.format_timecode(last),
+        "-i",
+        Path(input_path).as_posix(),
+        "-an",
+        "-sn",
+        "-vf",
+        f"select='({in_range})*({sample})',scale={width}:-2,format=gray,showinfo",
+        "-fps_mode",
+        "passthrough",
+        "-f",
+        "rawvideo",
+        raw_path.as_posix(),
+    ]
+    times = []
+    size = []
+
+    def on_output(line):
+        match = SHOWINFO_LINE.search(line)
+        if match:
+            times.append(float(match.group(1)) + first)
+            size[:] = [int(match.group(3)), int(match.group(2))]
+        elif "Parsed_showinfo" not in line:
+            utils.log_message(line, log_box, tk)
+
+    return_code = process_manager.get_manager().run(
+        cmd, group="covers", outputs=[raw_path], on_output=on_output
+    )
+    if return_code != 0:
+        raise RuntimeError(f"ffmpeg failed to read {Path(input_path).name}")
+    if not times:
+        return np.zeros(0), np.zeros((0, 1, 1), dtype=np.uint8)
+    height, frame_width = size
+    count = min(len(times), raw_path.stat().st_size // (height * frame_width))
+    frames = np.memmap(
+        raw_path, dtype=np.uint8, mode="r", shape=(count, height, frame_width)
+    )
+    return np.array(times[:count]), frames
+
+
+def score_candidates(times, frames, step):
+    # sharpness: variance of the Laplacian; motion: mean absolute change to
+    # the neighbouring candidates, so frames inside a cut or a fast pan lose
+    count = len(frames)
+    sharpness = np.empty(count)
+    brightness = np.empty(count)
+    change = np.full(count, np.nan)
+    for i in range(0, count, SCORE_CHUNK):
+        start = max(i - 1, 0)
+        chunk = frames[start : i + SCORE_CHUNK].astype(np.float32)
+        laplacian = (
+            chunk[:, :-2, 1:-1]
+            + chunk[:, 2:, 1:-1]
+            + chunk[:, 1:-1, :-2]
+            + chunk[:, 1:-1, 2:]
+            - 4 * chunk[:, 1:-1, 1:-1]
+        )
+        own = slice(i - start, None)
+        sharpness[i : i + SCORE_CHUNK] = laplacian.var(axis=(1, 2))[own]
+        brightness[i : i + SCORE_CHUNK] = chunk.mean(axis=(1, 2))[own]
+        diff = np.abs(np.diff(chunk, axis=0)).mean(axis=(1, 2))
+        change[start + 1 : i + SCORE_CHUNK] = diff
+    # no change across the gap between two ranges
+    change[1:][np.diff(times) > 1.5 * step] = np.nan
+    motion = np.fmax(change, np.append(change[1:], np.nan))
+    motion = np.nan_to_num(motion)
+    scores = np.log1p(sharpness) - np.log1p(motion)
+    # black and washed-out frames only win when nothing else is there
+    scores[(brightness < 16) | (brightness > 240)] = -np.inf
+    return scores
+
+
+def pick_cover_times(ranges, times, scores):
+    picks = []
+    for start, end in ranges:
+        candidates = np.flatnonzero((times >= start) & (times <= end))
+        if len(candidates):
+            picks.append(float(times[candidates[np.argmax(scores[candidates])]]))
+        else:
+            picks.append(start + min(1.0, (end - start) / 2))
+    return picks
+
+
+def write_covers(picks, cover_paths, sheet_path, log_box, tk):
+    # one ffmpeg run seeks to every picked frame, writes it as the cover
+    # and tiles a scaled copy of all of them into the contact sheet
+    cell_width = covers_config.get("sheet_cell_width", 320)
+    cell_height = cell_width * 9 // 16
+    columns = min(covers_config.get("sheet_columns", 6), len(picks))
+    rows = math.ceil(len(picks) / columns)
+    cmd = ["ffmpeg", "-y", "-hide_banner"]
+    filters = []
+    for k, (input_path, seconds) in enumerate(picks):
+        cmd += ["-ss", utils.format_timecode(seconds), "-i", input_path.as_posix()]
+        filters.append(
+            f"[{k}:v]trim=end_frame=1,setpts=PTS-STARTPTS,split[c{k}][s{k}]"
+        )
+        filters.append(
+            f"[s{k}]scale={cell_width}:{cell_height}:"
+            "force_original_aspect_ratio=decrease,"
+            f"pad={cell_width}:{cell_height}:(ow-iw)/2:(oh-ih)/2,setsar=1[t{k}]"
+        )
+    filters.append(
+        "".join(f"[t{k}]" for k in range(len(picks)))
+        + f"concat=n={len(picks)}:v=1:a=0,tile={columns}x{rows}[sheet]"
+    )
+    cmd += ["-filter_complex", ";".join(filters)]
+    for k, cover_path in enumerate(cover_paths):
+        cmd += ["-map", f"[c{k}]", "-frames:v", "1", "-q:v", "2"]
+        cmd.append(cover_path.as_posix())
+    cmd += ["-map", "[sheet]", "-frames:v", "1", "-q:v", "3", sheet_path.as_posix()]
+    return utils.run_tool(
+        cmd,
+        log_box,
+        tk,
+        group="covers",
+        resources=("cpu", "disk"),
+        outputs=[*cover_paths, sheet_path],
+    )
+
+
+def clip_source(clip_path):
+    # the video a clip was cut from, as recorded when it was cut; None when
+    # it was cut from downloaded sections or nothing was recorded
+    entry = Manifest(clip_path.parent).find(clip_path)
+    if entry is None or not entry["inputs"]:
+        return None
+    source = local_path(entry["inputs"][0])
+    if not source.exists():
+        raise RuntimeError(f"Source video of {clip_path.name} not found: {source}")
+    return source
+
+
+def make_covers(labels, log_box, tk):
+    if not config_manager.get_clips_json_path():
+        messagebox.showerror("Error", "Select json file")
+        return
+    manager = process_manager.get_manager()
+    if not manager.start_group("covers"):
+        messagebox.showwarning("Error", "Covers are already being made.")
+        return
+    try:
+        labels["covers_label"].config(text="In progress", foreground="blue")
+        _make_covers(labels, log_box, tk)
+    except process_manager.JobCancelled:
+        labels["covers_label"].config(text="Cancelled", foreground="red")
+    except Exception as e:
+        labels["covers_label"].config(text=f"Error: {e}", foreground="red")
+    finally:
+        manager.finish_group("covers")
+
+
+def _make_covers(labels, log_box, tk):
+    json_path = Path(config_manager.get_clips_json_path())
+    with open(json_path, "r", encoding="utf-8") as f:
+        clip_times = json.load(f)
+    # duplicates are another run's clips, which have their cover there
+    clip_times = [
+        clip
+        for clip in clip_times
+        if not clip.get("duplicate") and local_path(clip["filename"]).exists()
+    ]
+    if not clip_times:
+        labels["covers_label"].config(text="No clips", foreground="red")
+        return
+
+    step = covers_config.get("step", 0.5)
+    width = covers_config.get("scan_width", 160)
+    ranges = [
+        (utils.parse_timecode(clip["start"]), utils.parse_timecode(clip["end"]))
+        for clip in clip_times
+    ]
+    clip_paths = [local_path(clip["filename"]) for clip in clip_times]
+    # every clip range of a source in a single pass over it
+    scans = {}
+    for k, (clip_path, (start, end)) in enumerate(zip(clip_paths, ranges)):
+        source = clip_source(clip_path)
+        if source is None:
+            # audio-only source: the clip itself carries the video
+            scans[clip_path] = ([k], [(0.0, end - start)])
+        else:
+            indexes, scan_ranges = scans.setdefault(source, ([], []))
+            indexes.append(k)
+            scan_ranges.append((start, end))
+    scans = [(path, *scan) for path, scan in scans.items()]
+
+    manifest = Manifest(json_path.parent)
+    inputs = [scan[0] for scan in scans]
+    params = {"clips": clip_times, "step": step, "width": width}
+    sheet_path = json_path.parent / CONTACT_SHEET_NAME
+    cover_paths = [clip_path.with_suffix(".jpg") for clip_path in clip_paths]
+    if manifest.is_fresh("covers", inputs, params) and all(
+        cover_path.exists() for cover_path in cover_paths
+    ):
+        utils.log_message("Covers are up to date, skipping", log_box, tk)
+        labels["covers_label"].config(text=sheet_path.name, foreground="green")
+        return
+
+    picks = [None] * len(clip_times)
+    for input_path, indexes, scan_ranges in scans:
+        raw_path = json_path.parent / f"{input_path.stem}.covers.gray"
+        with artifact_store.in_use(raw_path):
+            try:
+                times, frames = scan_candidates(
+                    input_path, scan_ranges, raw_path, step, width, log_box, tk
+                )
+                scores = score_candidates(times, frames, step)
+                for k, seconds in zip(
+                    indexes, pick_cover_times(scan_ranges, times, scores)
+                ):
+                    picks[k] = (input_path, seconds)
+            finally:
+                # the memmap has to be closed before the file can go on Windows
+                frames = None
+                if raw_path.exists():
+                    os.remove(raw_path)
+
+    return_code = write_covers(picks, cover_paths, sheet_path, log_box, tk)
+    if return_code != 0:
+        raise RuntimeError("ffmpeg failed to write the covers")
+    manifest.record("covers", sheet_path, inputs, params)
+    artifact_store.touch(*cover_paths, sheet_path)
+    for clip_path, (_, seconds) in zip(clip_paths, picks):
+        utils.log_message(
+            f"{clip_path.stem}: cover at {utils.format_timecode(seconds)}", log_box, tk
+        )
+    labels["covers_label"].config(text=sheet_path.name, foreground="green")
+
+
+def cancel_covers():
+    process_manager.get_manager().cancel_group("covers")
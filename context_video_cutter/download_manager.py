@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import shutil
+from tkinter import messagebox
+
+import toml
+import yt_dlp
+
+import context_video_cutter.artifact_store as artifact_store
+import context_video_cutter.config_manager as config_manager
+import context_video_cutter.fingerprint_index as fingerprint_index
+import context_video_cutter.utils as utils
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+download_config = config.get("download", {})
+
+VIDEO_FORMAT = "bestvideo[height<=720]+bestaudio/best[height<=720]"
+
+
+class DownloadArchive:
+    # one "<extractor> <id>" line per downloaded video, compatible with
+    # yt-dlp --download-archive so the file can be shared with the CLI
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._keys = set()
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._keys = {line.strip() for line in f if line.strip()}
+
+    @staticmethod
+    def make_key(extractor, video_id):
+        return f"{extractor.lower()} {video_id}"
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def add(self, key):
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            os.makedirs(self.path.parent, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(key + "\n")
+
+
+class DownloadItem:
+    def __init__(self, url, title=None, archive_key=None):
+        self.url = url
+        self.title = title or url
+        self.archive_key = archive_key
+        self.status = "Queued"
+        self.progress = 0.0
+        self.attempts = 0
+        self.filepath = None
+        self.error = None
+
+
+class DownloadManager:
+    def __init__(
+        self,
+        output_dir=None,
+        video_format=VIDEO_FORMAT,
+        max_concurrent=None,
+        retries=None,
+        retry_backoff=None,
+        archive_path=None,
+        on_progress=None,
+        logger=None,
+    ):
+        self.output_dir = Path(
+            output_dir or BASE_DIR / config["paths"]["sources_dir"]
+        )
+        self.video_format = video_format
+        self.max_concurrent = max_concurrent or download_config.get(
+            "max_concurrent", 3
+        )
+        self.retries = (
+            retries if retries is not None else download_config.get("retries", 3)
+        )
+        self.retry_backoff = (
+            retry_backoff
+            if retry_backoff is not None
+            else download_config.get("retry_backoff", 5)
+        )
+        self.archive = DownloadArchive(
+            archive_path
+            or BASE_DIR / download_config.get("archive", "sources/archive.txt")
+        )
+        self.on_progress = on_progress or (lambda item: None)
+        self.logger = logger
+
+    def expand(self, urls):
+        # playlists are listed flat, so ids are known without touching the
+        # video pages and archived entries are skipped before any request
+        items = []
+        ydl_opts = {
+            "extract_flat": "in_playlist",
+            "skip_download": True,
+            "quiet": True,
+            "logger": self.logger,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            for url in urls:
+                try:
+                    info = ydl.extract_info(url, download=False)
+                except Exception as e:
+                    item = DownloadItem(url)
+                    item.status = "Failed"
+                    item.error = str(e)
+                    items.append(item)
+                    continue
+                entries = info.get("entries")
+                if entries is None:
+                    entries = [info]
+                for entry in entries:
+                    if not entry:
+                        continue
+                    extractor = entry.get("ie_key") or info.get("extractor_key")
+                    # an entry without an id is downloaded, just not archived
+                    archive_key = None
+                    if entry.get("id"):
+                        archive_key = DownloadArchive.make_key(
+                            extractor or "generic", entry["id"]
+                        )
+                    items.append(
+                        DownloadItem(
+                            url=entry.get("webpage_url") or entry.get("url") or url,
+                            title=entry.get("title"),
+                            archive_key=archive_key,
+                        )
+                    )
+        return items
+
+    def run(self, urls):
+        os.makedirs(self.output_dir, exist_ok=True)
+        # queued items resume their .part files, which must survive a sweep
+        with artifact_store.downloading():
+            items = self.expand(urls)
+            pending = []
+            for item in items:
+                if item.status == "Failed":
+                    self.on_progress(item)
+                elif item.archive_key in self.archive:
+                    item.status = "Skipped"
+                    self.on_progress(item)
+                else:
+                    pending.append(item)
+
+            with ThreadPoolExecutor(max_workers=self.max_concurrent) as pool:
+                list(pool.map(self._download, pending))
+        return items
+
+    def _download(self, item):
+        ydl_opts = {
+            "format": self.video_format,
+            "outtmpl": self.output_dir.as_posix() + "/%(title)s.%(ext)s",
+            "noplaylist": True,
+            # keep .part files and resume them on the next attempt
+            "continuedl": True,
+            "nopart": False,
+            "logger": self.logger,
+            "progress_hooks": [lambda d: self._on_hook(item, d)],
+        }
+        while True:
+            item.attempts += 1
+            item.status = "Downloading"
+            self.on_progress(item)
+            try:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info = ydl.extract_info(item.url, download=True)
+                # same content under another title: keep the first copy
+                item.filepath = fingerprint_index.get_index().register_source(
+                    utils.get_downloaded_path(info), item.archive_key
+                )
+                artifact_store.touch(item.filepath)
+                item.progress = 100.0
+                item.status = "Done"
+                if item.archive_key:
+                    self.archive.add(item.archive_key)
+                self.on_progress(item)
+                return item
+            except Exception as e:
+                # only network / extractor errors are worth another attempt; a
+                # full disk or a postprocessor failure fails just this item
+                item.error = f"{type(e).__name__}: {e}"
+                retry = isinstance(e, yt_dlp.utils.DownloadError)
+                if not retry or item.attempts > self.retries:
+                    item.status = "Failed"
+                    self.on_progress(item)
+                    return item
+                delay = self.retry_backoff * 2 ** (item.attempts - 1)
+                item.status = f"Retry in {delay}s"
+                self.on_progress(item)
+                time.sleep(delay)
+
+    def _on_hook(self, item, d):
+        if d["status"] != "downloading":
+            return
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        if total:
+            progress = d.get("downloaded_bytes", 0) * 100 / total
+            # report in 10% steps so large batches don't flood the log
+            if int(progress // 10) != int(item.progress // 10):
+                item.progress = progress
+                self.on_progress(item)
+
+
+def download_batch(urls, log_box, tk, labels=None):
+    urls = urls.split() if isinstance(urls, str) else list(urls)
+    if not urls:
+        messagebox.showerror("Error", "No link!")
+        return
+
+    def on_progress(item):
+        message = f"[{item.status}] {item.progress:.0f}% {item.title}"
+        if item.status == "Failed" and item.error:
+            message += f": {item.error}"
+        utils.log_message(message, log_box, tk)
+
+    def worker():
+        try:
+            manager = DownloadManager(
+                on_progress=on_progress, logger=utils.YTDLPLogger(log_box, tk)
+            )
+            items = manager.run(urls)
+            artifact_store.get_store().enforce_quota(
+                log=lambda message: utils.log_message(message, log_box, tk)
+            )
+        except Exception as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        done = [item for item in items if item.status == "Done"]
+        skipped = [item for item in items if item.status == "Skipped"]
+        failed = [item for item in items if item.status == "Failed"]
+        if done:
+            config_manager.set_source_file_path(done[0].filepath.as_posix())
+            config_manager.set_source_url("")
+            if labels:
+                labels["selected_file_label"].config(
+                    text=done[0].filepath.name, style="Green.TLabel"
+                )
+        if labels:
+            labels["downloaded_file_label"].config(
+                text=f"Done: {len(done)}, skipped: {len(skipped)}, "
+                f"failed: {len(failed)}",
+                style="Green.TLabel" if not failed else "Blue.TLabel",
+            )
+
+    threading.Thread(target=worker, daemon=True).start()
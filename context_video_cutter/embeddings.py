@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+import shutil
+
+import numpy as np
+import toml
+from filelock import FileLock
+from slugify import slugify
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+embeddings_config = config.get("embeddings", {})
+
+DEFAULT_MODELS = {
+    "spacy": {"en": "en_core_web_sm", "ru": "ru_core_news_sm"},
+    "sentence-transformers": {
+        "en": "all-MiniLM-L6-v2",
+        "ru": "paraphrase-multilingual-MiniLM-L12-v2",
+    },
+}
+
+# sha1 hex digest + newline
+KEY_LINE_SIZE = 41
+
+_backends = {}
+_caches = {}
+_lock = threading.Lock()
+
+
+class SpacyBackend:
+    name = "spacy"
+
+    def __init__(self, model):
+        import spacy
+
+        self.model = model
+        # .vector only needs the tok2vec tensor
+        self.nlp = spacy.load(model, disable=["parser", "ner", "lemmatizer"])
+
+    def embed(self, texts):
+        return np.array(
+            [doc.vector for doc in self.nlp.pipe(texts, batch_size=64)],
+            dtype=np.float32,
+        )
+
+
+class SentenceTransformerBackend:
+    name = "sentence-transformers"
+
+    def __init__(self, model):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "Install sentence-transformers to use this embedding backend"
+            ) from e
+
+        self.model = model
+        self.encoder = SentenceTransformer(model, device="cpu")
+
+    def embed(self, texts):
+        return self.encoder.encode(
+            list(texts), batch_size=32, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+BACKENDS = {
+    SpacyBackend.name: SpacyBackend,
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+}
+
+
+class EmbeddingCache:
+    # One directory per (backend, model). vectors.f16 holds float16 rows in
+    # append order, keys.txt the sha1 of the text of each row. Rows are
+    # written before keys, so after a crash only rows with a key are used,
+    # and the next append cuts both files back to that length.
+    def __init__(self, backend, cache_dir=None):
+        self.backend = backend
+        cache_dir = Path(
+            cache_dir
+            or BASE_DIR / embeddings_config.get("cache_dir", "models/embeddings")
+        )
+        self.dir = cache_dir / slugify(f"{backend.name}-{backend.model}")
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.f16"
+        self.keys_path = self.dir / "keys.txt"
+        self.meta_path = self.dir / "meta.json"
+        self.lock = FileLock(self.dir.as_posix() + ".lock")
+        # the FileLock only orders processes; threads of one process (GUI
+        # detection, daemon, job worker) share index and matrix, which
+        # _load rebuilds, so they take this one too (re-entrant: get ->
+        # _append -> _load)
+        self.thread_lock = threading.RLock()
+        self.dim = None
+        self.index = {}
+        self.matrix = None
+        self._load()
+
+    @staticmethod
+    def make_key(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        with self.thread_lock:
+            self.matrix = None
+            if not self.meta_path.exists():
+                return
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+            keys = []
+            if self.keys_path.exists():
+                with open(self.keys_path, "r", encoding="utf-8") as f:
+                    keys = [key for key in f.read().split() if len(key) == 40]
+            stored_rows = 0
+            if self.vectors_path.exists():
+                stored_rows = self.vectors_path.stat().st_size // (self.dim * 2)
+            n_rows = min(len(keys), stored_rows)
+            self.index = {key: i for i, key in enumerate(keys[:n_rows])}
+            if n_rows:
+                self.matrix = np.memmap(
+                    self.vectors_path,
+                    dtype=np.float16,
+                    mode="r",
+                    shape=(n_rows, self.dim),
+                )
+
+    def _append(self, keys, vectors):
+        with self.thread_lock, self.lock:
+            # other processes may have appended since we loaded
+            self._load()
+            new_rows = [
+                (key, vector)
+                for key, vector in zip(keys, vectors)
+                if key not in self.index
+            ]
+            if not new_rows:
+                return
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            n_rows = len(self.index)
+            self.matrix = None
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(n_rows * self.dim * 2)
+                f.write(
+                    np.asarray([v for _, v in new_rows], dtype=np.float16).tobytes()
+                )
+            with open(self.keys_path, "ab") as f:
+                f.truncate(n_rows * KEY_LINE_SIZE)
+                f.write("".join(key + "\n" for key, _ in new_rows).encode("ascii"))
+            self._load()
+
+    def get(self, texts):
+        keys = [self.make_key(text) for text in texts]
+        with self.thread_lock:
+            if any(key not in self.index for key in keys):
+                # pick up rows another process may have cached meanwhile
+                self._load()
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self.index and key not in missing:
+                    missing[key] = text
+            if missing:
+                self._append(
+                    list(missing), self.backend.embed(list(missing.values()))
+                )
+            if not keys:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            rows = np.array([self.index[key] for key in keys], dtype=np.int64)
+            return np.asarray(self.matrix[rows], dtype=np.float32)
+
+
+def get_backend(language="en"):
+    backend_name = embeddings_config.get("backend", "spacy")
+    default_models = DEFAULT_MODELS[backend_name]
+    model = embeddings_config.get("models", {}).get(language) or default_models.get(
+        language, default_models["en"]
+    )
+    with _lock:
+        key = (backend_name, model)
+        if key not in _backends:
+            _backends[key] = BACKENDS[backend_name](model)
+        return _backends[key]
+
+
+def embed(texts, language="en"):
+    backend = get_backend(language)
+    with _lock:
+        key = (backend.name, backend.model)
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(backend)
+        cache = _caches[key]
+    return cache.get(texts)
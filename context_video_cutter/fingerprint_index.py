@@ -0,0 +1,315 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+import shutil
+
+import numpy as np
+import toml
+
+import context_video_cutter.artifact_store as artifact_store
+import context_video_cutter.process_manager as process_manager
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+fingerprints_config = config.get("fingerprints", {})
+
+# sampled source hash: file size plus 16 chunks of 64 KiB spread over the file
+HASH_SAMPLES = 16
+HASH_CHUNK = 1 << 16
+
+# audio fingerprint: one 32-bit sub-fingerprint per 23 ms, each bit the sign
+# of an energy difference between neighbouring bands and frames
+SAMPLE_RATE = 5512
+FRAME = 2048
+HOP = 128
+BAND_EDGES = np.geomspace(300, 2000, 34)
+# only sub-fingerprints with hash & 7 == 0 go into the lookup table: an
+# eighth of the rows, and the same ones are picked from any copy
+LOOKUP_MASK = 7
+MIN_VOTES = 3
+MAX_CANDIDATES = 10
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def source_hash(path):
+    path = Path(path)
+    size = path.stat().st_size
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        for k in range(HASH_SAMPLES):
+            f.seek(k * max(size - HASH_CHUNK, 0) // (HASH_SAMPLES - 1))
+            digest.update(f.read(HASH_CHUNK))
+    return digest.hexdigest()
+
+
+def video_key(info, audio_only=False):
+    # same form as the download archive keys, plus the kind of download
+    key = f"{info.get('extractor_key', 'generic').lower()} {info['id']}"
+    return key + " audio" if audio_only else key
+
+
+def compute_fingerprint(samples):
+    samples = np.asarray(samples, dtype=np.float32)
+    if len(samples) < FRAME + HOP:
+        return np.zeros(0, dtype=np.uint32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME)[::HOP]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME), axis=1)) ** 2
+    edges = np.searchsorted(np.fft.rfftfreq(FRAME, 1 / SAMPLE_RATE), BAND_EDGES)
+    energy = np.add.reduceat(spectrum[:, : edges[-1]], edges[:-1], axis=1)
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    weights = np.left_shift(np.uint64(1), np.arange(32, dtype=np.uint64))
+    return (bits.astype(np.uint64) * weights).sum(axis=1).astype(np.uint32)
+
+
+def bit_error_rate(a, b, min_overlap):
+    # align on the offset most equal sub-fingerprints agree on, then count
+    # differing bits over the overlap; 1.0 if they overlap too little
+    positions = {}
+    for j, value in enumerate(b.tolist()):
+        positions.setdefault(value, []).append(j)
+    votes = Counter(
+        i - j for i, value in enumerate(a.tolist()) for j in positions.get(value, ())
+    )
+    if not votes:
+        return 1.0
+    offset = votes.most_common(1)[0][0]
+    first = max(0, offset)
+    last = min(len(a), len(b) + offset)
+    if last - first < min_overlap * min(len(a), len(b)):
+        return 1.0
+    diff = np.bitwise_xor(a[first:last], b[first - offset : last - offset])
+    return np.unpackbits(diff.view(np.uint8)).sum() / (32 * (last - first))
+
+
+class FingerprintIndex:
+    # Sources by sampled content hash and download id, clips by source range
+    # and audio fingerprint, and which account every clip went to.
+    def __init__(self, db_path=None):
+        self.db_path = Path(
+            db_path
+            or BASE_DIR / fingerprints_config.get("db", "models/fingerprints.sqlite")
+        )
+        self.max_overlap = fingerprints_config.get("max_overlap", 0.5)
+        self.max_bit_error = fingerprints_config.get("max_bit_error", 0.35)
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS sources (
+                    content_hash TEXT PRIMARY KEY, video_key TEXT,
+                    path TEXT NOT NULL, added REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS sources_video_key ON sources (video_key);
+                CREATE TABLE IF NOT EXISTS clips (
+                    id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL,
+                    source_hash TEXT, start REAL, end REAL,
+                    fingerprint BLOB NOT NULL);
+                CREATE INDEX IF NOT EXISTS clips_source ON clips (source_hash);
+                CREATE TABLE IF NOT EXISTS clip_hashes (
+                    hash INTEGER NOT NULL, clip_id INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS clip_hashes_hash ON clip_hashes (hash);
+                CREATE INDEX IF NOT EXISTS clip_hashes_clip ON clip_hashes (clip_id);
+                CREATE TABLE IF NOT EXISTS uploads (
+                    clip_id INTEGER NOT NULL, account TEXT NOT NULL,
+                    PRIMARY KEY (clip_id, account));
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path.as_posix(), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def find_source(self, content_hash=None, key=None):
+        # path of an already downloaded copy that still exists
+        with self._connect() as db:
+            if content_hash is not None:
+                row = db.execute(
+                    "SELECT path FROM sources WHERE content_hash = ?", (content_hash,)
+                ).fetchone()
+            else:
+                row = db.execute(
+                    "SELECT path FROM sources WHERE video_key = ?", (key,)
+                ).fetchone()
+        if row and Path(row[0]).exists():
+            return Path(row[0])
+        return None
+
+    def register_source(self, path, key=None):
+        # returns the path to use: an existing copy with the same content
+        # wins, and the new download is removed
+        path = Path(path)
+        content_hash = source_hash(path)
+        duplicate = self.find_source(content_hash=content_hash)
+        if duplicate and duplicate.resolve() != path.resolve():
+            os.remove(path)
+            return duplicate
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                (content_hash, key, path.as_posix(), time.time()),
+            )
+        return path
+
+    def overlapping_clip(self, content_hash, start, end, exclude_dir=None):
+        # (path, start, end) of an existing clip of the same source sharing
+        # more than max_overlap of the shorter of the two ranges; clips in
+        # exclude_dir (the set being cut, whatever their numbers) don't count
+        exclude_dir = Path(exclude_dir).resolve() if exclude_dir else None
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT path, start, end FROM clips "
+                "WHERE source_hash = ? AND start < ? AND end > ?",
+                (content_hash, end, start),
+            ).fetchall()
+        for path, other_start, other_end in rows:
+            path = Path(path)
+            if path.parent.resolve() == exclude_dir or not path.exists():
+                continue
+            overlap = min(end, other_end) - max(start, other_start)
+            shorter = min(end - start, other_end - other_start)
+            if shorter > 0 and overlap / shorter > self.max_overlap:
+                return path, other_start, other_end
+        return None
+
+    def add_clip(self, path, content_hash=None, start=None, end=None, group=None):
+        fingerprint = decode_fingerprint(path, group)
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id FROM clips WHERE path = ?", (Path(path).as_posix(),)
+            ).fetchone()
+            if row:
+                db.execute("DELETE FROM clip_hashes WHERE clip_id = ?", row)
+                db.execute(
+                    "UPDATE clips SET source_hash = ?, start = ?, end = ?, "
+                    "fingerprint = ? WHERE id = ?",
+                    (content_hash, start, end, fingerprint.tobytes(), row[0]),
+                )
+                clip_id = row[0]
+            else:
+                clip_id = db.execute(
+                    "INSERT INTO clips (path, source_hash, start, end, fingerprint) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        Path(path).as_posix(),
+                        content_hash,
+                        start,
+                        end,
+                        fingerprint.tobytes(),
+                    ),
+                ).lastrowid
+            lookup = np.unique(fingerprint[(fingerprint & LOOKUP_MASK) == 0])
+            db.executemany(
+                "INSERT INTO clip_hashes VALUES (?, ?)",
+                [(int(value), clip_id) for value in lookup],
+            )
+        return fingerprint
+
+    def clip_fingerprint(self, path, group=None):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT fingerprint FROM clips WHERE path = ?", (Path(path).as_posix(),)
+            ).fetchone()
+        if row:
+            return np.frombuffer(row[0], dtype=np.uint32)
+        return self.add_clip(path, group=group)
+
+    def find_similar(self, fingerprint, exclude_path=None, account=None):
+        # candidates share sampled sub-fingerprints exactly; the best few
+        # are then compared bit by bit
+        lookup = np.unique(fingerprint[(fingerprint & LOOKUP_MASK) == 0]).tolist()
+        votes = Counter()
+        with self._connect() as db:
+            for i in range(0, len(lookup), 500):
+                chunk = lookup[i : i + 500]
+                query = (
+                    "SELECT clip_id, COUNT(*) FROM clip_hashes WHERE hash IN "
+                    f"({','.join('?' * len(chunk))}) GROUP BY clip_id"
+                )
+                votes.update(dict(db.execute(query, chunk).fetchall()))
+            for clip_id, count in votes.most_common(MAX_CANDIDATES):
+                if count < MIN_VOTES:
+                    break
+                path, blob = db.execute(
+                    "SELECT path, fingerprint FROM clips WHERE id = ?", (clip_id,)
+                ).fetchone()
+                if exclude_path and path == Path(exclude_path).as_posix():
+                    continue
+                if account and not db.execute(
+                    "SELECT 1 FROM uploads WHERE clip_id = ? AND account = ?",
+                    (clip_id, account),
+                ).fetchone():
+                    continue
+                other = np.frombuffer(blob, dtype=np.uint32)
+                error = bit_error_rate(fingerprint, other, self.max_overlap)
+                if error < self.max_bit_error:
+                    return Path(path)
+        return None
+
+    def find_uploaded_duplicate(self, path, account):
+        fingerprint = self.clip_fingerprint(path)
+        return self.find_similar(fingerprint, exclude_path=path, account=account)
+
+    def mark_uploaded(self, path, account):
+        self.clip_fingerprint(path)
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO uploads "
+                "SELECT id, ? FROM clips WHERE path = ?",
+                (account, Path(path).as_posix()),
+            )
+
+
+def decode_fingerprint(path, group=None):
+    # mono PCM at the fingerprint rate, decoded next to the clip
+    pcm_path = Path(path).with_suffix(".fingerprint.pcm")
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        Path(path).as_posix(),
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-f",
+        "s16le",
+        pcm_path.as_posix(),
+    ]
+    with artifact_store.in_use(pcm_path):
+        try:
+            return_code = process_manager.get_manager().run(
+                cmd, group=group, outputs=[pcm_path]
+            )
+            if return_code != 0:
+                raise RuntimeError(f"ffmpeg failed to decode {Path(path).name}")
+            return compute_fingerprint(np.fromfile(pcm_path, dtype=np.int16))
+        finally:
+            if pcm_path.exists():
+                os.remove(pcm_path)
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex()
+        return _index
@@ -8,8 +8,16 @@ import context_video_cutter.subtitle_processing as subtitle_processing
 import toml
 import context_video_cutter.utils as utils
 import context_video_cutter.video_processing as video_processing
-from context_video_cutter import uploader
-from context_video_cutter.config_manager import set_language, set_account, get_account_config
+from context_video_cutter import (
+    batch_detection,
+    covers,
+    download_manager,
+    job_queue,
+    live_ingest,
+    uploader,
+)
+from context_video_cutter.clip_table import ClipTable
+from context_video_cutter.config_manager import set_language, set_account, get_account_config, set_whisper_profile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 config_path = BASE_DIR / "config.toml"
@@ -95,7 +103,7 @@ def create_app():
     )
     tik_tok_selected_file_label.grid(row=4, column=0, columnspan=2, sticky="w")
 
-    ttk.Label(tik_tok_video_frame, text="Or paste a YouTube link:").grid(
+    ttk.Label(tik_tok_video_frame, text="Or paste YouTube link(s) or a playlist:").grid(
         row=5, column=0, columnspan=2, sticky="w", pady=5
     )
     tik_tok_url_entry = ttk.Entry(tik_tok_video_frame, width=50)
@@ -116,6 +124,32 @@ def create_app():
             },
         ),
     ).pack(side="left", padx=(0, 5))
+    ttk.Button(
+        tik_tok_url_button_frame,
+        text="Download audio only",
+        command=lambda: utils.download_audio(
+            url=tik_tok_url_entry.get().strip(),
+            log_box=tik_tok_log_box,
+            tk=tk,
+            labels={
+                "downloaded_file_label": tik_tok_downloaded_file_label,
+                "selected_file_label": tik_tok_selected_file_label,
+            },
+        ),
+    ).pack(side="left", padx=(0, 5))
+    ttk.Button(
+        tik_tok_url_button_frame,
+        text="Download all links",
+        command=lambda: download_manager.download_batch(
+            urls=tik_tok_url_entry.get().strip(),
+            log_box=tik_tok_log_box,
+            tk=tk,
+            labels={
+                "downloaded_file_label": tik_tok_downloaded_file_label,
+                "selected_file_label": tik_tok_selected_file_label,
+            },
+        ),
+    ).pack(side="left", padx=(0, 5))
     ttk.Button(
         tik_tok_url_button_frame,
         text="Open source folder",
@@ -126,6 +160,50 @@ def create_app():
     )
     tik_tok_downloaded_file_label.pack(side="left", padx=(0, 5))
 
+    tik_tok_storage_frame = ttk.Frame(tik_tok_video_frame)
+    tik_tok_storage_frame.grid(row=8, column=0, columnspan=2, sticky="ew", pady=(0, 10))
+    ttk.Button(
+        tik_tok_storage_frame,
+        text="Free disk space",
+        command=lambda: utils.free_disk_space(
+            tik_tok_storage_label, tik_tok_log_box, tk
+        ),
+    ).pack(side="left", padx=(0, 5))
+    tik_tok_storage_label = ttk.Label(tik_tok_storage_frame, text="")
+    tik_tok_storage_label.pack(side="left", padx=(0, 5))
+
+    tik_tok_live_frame = ttk.Frame(tik_tok_video_frame)
+    tik_tok_live_frame.grid(row=9, column=0, columnspan=2, sticky="ew", pady=(0, 10))
+    ttk.Button(
+        tik_tok_live_frame,
+        text="Start live",
+        command=lambda: live_ingest.start_live_ingest(
+            url=tik_tok_url_entry.get().strip(),
+            labels={"live_label": tik_tok_live_label},
+            log_box=tik_tok_log_box,
+            tk=tk,
+        ),
+    ).pack(side="left", padx=(0, 5))
+    ttk.Button(
+        tik_tok_live_frame,
+        text="Finish live",
+        command=live_ingest.finish_live_ingest,
+    ).pack(side="left", padx=(0, 5))
+    tik_tok_live_label = ttk.Label(tik_tok_live_frame, text="")
+    tik_tok_live_label.pack(side="left", padx=(0, 5))
+
+    tik_tok_jobs_frame = ttk.Frame(tik_tok_video_frame)
+    tik_tok_jobs_frame.grid(row=10, column=0, columnspan=2, sticky="ew", pady=(0, 10))
+    ttk.Button(
+        tik_tok_jobs_frame,
+        text="Send to workers",
+        command=lambda: job_queue.send_to_workers(
+            tik_tok_jobs_label, tik_tok_log_box, tk
+        ),
+    ).pack(side="left", padx=(0, 5))
+    tik_tok_jobs_label = ttk.Label(tik_tok_jobs_frame, text="")
+    tik_tok_jobs_label.pack(side="left", padx=(0, 5))
+
     # === Section: Subtitles ===
     tik_tok_subs_frame = ttk.LabelFrame(tik_tok_left_scrollable_frame, text="3. Subtitles")
     tik_tok_subs_frame.pack(fill="x", padx=10, pady=10)
@@ -157,6 +235,37 @@ def create_app():
     ).grid(row=0, column=0, sticky="w", pady=5)
     tik_tok_subtitle_label = ttk.Label(tik_tok_subs_frame, text="Status: Not started")
     tik_tok_subtitle_label.grid(row=0, column=1, sticky="w")
+    ttk.Button(
+        tik_tok_subs_frame,
+        text="Cancel",
+        command=subtitle_processing.cancel_transcription,
+    ).grid(row=0, column=2, sticky="w", pady=5)
+    ttk.Button(
+        tik_tok_subs_frame,
+        text="Subtitles for timecodes only",
+        command=lambda: subtitle_processing.transcribe_ranges(
+            labels={
+                "subtitle_label": tik_tok_subtitle_label,
+                "selected_subs_label": tik_tok_selected_subs_label,
+            },
+            log_box=tik_tok_log_box,
+            tk=tk,
+            timecodes_textbox=tik_tok_timecodes_textbox,
+        ),
+    ).grid(row=2, column=0, sticky="w", pady=5)
+
+    tik_tok_whisper_profile = tk.StringVar(value=config.get("whisper", {}).get("profile", "balanced"))
+    tik_tok_whisper_profile.trace_add("write", lambda *_: set_whisper_profile(tik_tok_whisper_profile.get()))
+    ttk.Label(tik_tok_subs_frame, text="Speed profile:").grid(row=3, column=0, sticky="w", pady=5)
+    tik_tok_profiles_frame = ttk.Frame(tik_tok_subs_frame)
+    tik_tok_profiles_frame.grid(row=3, column=1, columnspan=2, sticky="w")
+    for profile_name in utils.WHISPER_PROFILES:
+        tk.Radiobutton(
+            tik_tok_profiles_frame,
+            text=profile_name.capitalize(),
+            variable=tik_tok_whisper_profile,
+            value=profile_name,
+        ).pack(side="left")
 
     # === Section: Detect interesting moments ===
     tik_tok_interesting_frame = ttk.LabelFrame(
@@ -180,6 +289,13 @@ def create_app():
             daemon=True,
         ).start(),
     ).grid(row=3, column=0, columnspan=2, sticky="ew", pady=5)
+    ttk.Button(
+        tik_tok_interesting_frame,
+        text="Detect moments for many SRT files",
+        command=lambda: batch_detection.detect_selected_files(
+            tik_tok_interests_status_label, tik_tok_log_box, tk
+        ),
+    ).grid(row=4, column=0, columnspan=2, sticky="ew", pady=5)
 
     # === Section: Clip Cutting ===
     tik_tok_cut_frame = ttk.LabelFrame(tik_tok_left_scrollable_frame, text="5. Clip Cutting")
@@ -201,8 +317,7 @@ def create_app():
                 {
                     "clip_cutting_label": tik_tok_clip_cutting_label,
                     "clips_json": tik_tok_clips_json_label,
-                    "embedding_clips_label": tik_tok_embedding_clips_label,
-                    "embedding_clips_statuses_label": tik_tok_embedding_clips_statuses_label,
+                    "clip_table": tik_tok_clip_table,
                     "timecodes_textbox": tik_tok_timecodes_textbox,
                 },
                 tik_tok_log_box,
@@ -211,6 +326,30 @@ def create_app():
             daemon=True,
         ).start(),
     ).grid(row=2, column=0, sticky="w", pady=5)
+    ttk.Button(
+        tik_tok_cut_frame,
+        text="Cancel",
+        command=video_processing.cancel_cut_video,
+    ).grid(row=3, column=0, sticky="w", pady=5)
+
+    tik_tok_covers_frame = ttk.Frame(tik_tok_cut_frame)
+    tik_tok_covers_frame.grid(row=4, column=0, columnspan=2, sticky="ew", pady=5)
+    ttk.Button(
+        tik_tok_covers_frame,
+        text="Make covers",
+        command=lambda: threading.Thread(
+            target=covers.make_covers,
+            args=({"covers_label": tik_tok_covers_label}, tik_tok_log_box, tk),
+            daemon=True,
+        ).start(),
+    ).pack(side="left", padx=(0, 5))
+    ttk.Button(
+        tik_tok_covers_frame,
+        text="Cancel",
+        command=covers.cancel_covers,
+    ).pack(side="left", padx=(0, 5))
+    tik_tok_covers_label = ttk.Label(tik_tok_covers_frame, text="")
+    tik_tok_covers_label.pack(side="left", padx=(0, 5))
 
     # === Section: Subtitle Embedding ===
     tik_tok_convert_frame = ttk.LabelFrame(tik_tok_left_scrollable_frame, text="6. Subtitle Embedding")
@@ -222,8 +361,7 @@ def create_app():
             file_type="clips_json",
             file_label=tik_tok_clips_json_label,
             additional_labels={
-                "embedding_clips_label": tik_tok_embedding_clips_label,
-                "embedding_clips_statuses_label": tik_tok_embedding_clips_statuses_label,
+                "clip_table": tik_tok_clip_table,
             },
         ),
     ).grid(row=0, column=0, sticky="w", pady=5)
@@ -232,16 +370,8 @@ def create_app():
     )
     tik_tok_clips_json_label.grid(row=0, column=1, sticky="w", pady=5)
 
-    tik_tok_embedding_clips_label = ttk.Label(
-        tik_tok_convert_frame, text="No clips", style="Red.TLabel"
-    )
-    tik_tok_embedding_clips_label.grid(row=1, column=0, columnspan=2, sticky="w", pady=5)
-    tik_tok_embedding_clips_statuses_label = ttk.Label(
-        tik_tok_convert_frame, text="Not started", style="Red.TLabel"
-    )
-    tik_tok_embedding_clips_statuses_label.grid(
-        row=1, column=2, columnspan=2, sticky="w", pady=5
-    )
+    tik_tok_clip_table = ClipTable(tik_tok_convert_frame)
+    tik_tok_clip_table.grid(row=1, column=0, columnspan=4, sticky="ew", pady=5)
     ttk.Button(
         tik_tok_convert_frame,
         text="Embed Subtitles",
@@ -249,8 +379,7 @@ def create_app():
             target=video_processing.hardcode_subs,
             args=(
                 {
-                    "embedding_clips_label": tik_tok_embedding_clips_label,
-                    "embedding_clips_statuses_label": tik_tok_embedding_clips_statuses_label,
+                    "clip_table": tik_tok_clip_table,
                 },
                 tik_tok_log_box,
                 tk,
@@ -316,6 +445,20 @@ def create_app():
         ),
         daemon=True,
     ).start(), text="Upload to TikTok").grid(row=4, column=0, sticky="w", pady=5)
+    ttk.Button(tik_tok_upload_frame, command=lambda: threading.Thread(
+        target=uploader.upload_tik_tok_videos,
+        args=(
+            {
+                "uploading_status_label": tik_tok_uploading_status_label,
+                "tik_tok_count_entry" : tik_tok_count_entry,
+                "tik_tok_hours_between_entry": tik_tok_hours_between_entry,
+            },
+            tik_tok_log_box,
+            tk,
+            True,
+        ),
+        daemon=True,
+    ).start(), text="Upload for all accounts").grid(row=4, column=1, sticky="w", pady=5)
     tik_tok_uploading_status_label = ttk.Label(
         tik_tok_upload_frame, text="Not started", style="Red.TLabel"
     )
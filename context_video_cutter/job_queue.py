@@ -0,0 +1,444 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import shutil
+
+import toml
+from slugify import slugify
+
+import context_video_cutter.artifact_store as artifact_store
+import context_video_cutter.config_manager as config_manager
+import context_video_cutter.fingerprint_index as fingerprint_index
+import context_video_cutter.loudness as loudness
+import context_video_cutter.process_manager as process_manager
+import context_video_cutter.subtitle_processing as subtitle_processing
+import context_video_cutter.utils as utils
+import context_video_cutter.video_processing as video_processing
+from context_video_cutter.manifest import Manifest
+from context_video_cutter.shared_paths import local_path, shared_path
+from context_video_cutter.transcript import Transcript
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+jobs_config = config.get("jobs", {})
+
+# Usage:
+#   python -m context_video_cutter.job_queue submit SOURCE [--account NAME]
+#   python -m context_video_cutter.job_queue worker [--stages transcribe,cut]
+#   python -m context_video_cutter.job_queue status
+# Jobs live in an SQLite file next to the shared output folder. A worker
+# claims one job at a time with a lease it keeps renewing while the job
+# runs; a job whose lease ran out (its worker died) is claimed again.
+# Paths in jobs are stored relative to the shared folders (see shared_paths).
+
+STAGES = {}
+
+
+def stage(name):
+    # registers a job handler: handler(payload) -> (result, next jobs), the
+    # next jobs being (stage, payload) pairs queued when this one is done
+    def register(handler):
+        STAGES[name] = handler
+        return handler
+
+    return register
+
+
+class JobQueue:
+    def __init__(self, db_path=None):
+        self.db_path = Path(
+            db_path or BASE_DIR / jobs_config.get("db", "results/jobs.sqlite")
+        )
+        self.lease = jobs_config.get("lease", 60)
+        self.max_attempts = jobs_config.get("max_attempts", 3)
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY, stage TEXT NOT NULL,
+                    payload TEXT NOT NULL, status TEXT NOT NULL,
+                    worker TEXT, lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT, error TEXT,
+                    created REAL NOT NULL, finished REAL);
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, stage);
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path.as_posix(), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _insert(db, jobs):
+        db.executemany(
+            "INSERT INTO jobs (stage, payload, status, created) "
+            "VALUES (?, ?, 'queued', ?)",
+            [(name, json.dumps(payload), time.time()) for name, payload in jobs],
+        )
+
+    def submit(self, name, payload):
+        with self._connect() as db:
+            self._insert(db, [(name, payload)])
+            return db.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    def claim(self, worker, stages):
+        # the oldest queued job of the given stages, or one whose lease ran
+        # out; (id, attempts) identifies this claim from now on
+        now = time.time()
+        placeholders = ",".join("?" * len(stages))
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', "
+                "finished = ? WHERE status = 'running' AND lease_until < ? "
+                "AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT id, stage, payload, attempts FROM jobs "
+                f"WHERE stage IN ({placeholders}) AND (status = 'queued' "
+                "OR (status = 'running' AND lease_until < ?)) "
+                "ORDER BY id LIMIT 1",
+                (*stages, now),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, name, payload, attempts = row
+            db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, "
+                "attempts = ? WHERE id = ?",
+                (worker, now + self.lease, attempts + 1, job_id),
+            )
+        return {
+            "id": job_id,
+            "stage": name,
+            "payload": json.loads(payload),
+            "worker": worker,
+            "attempts": attempts + 1,
+        }
+
+    def _update_claimed(self, db, job, assignments, params):
+        # only the current claim may change the job: a worker that lost its
+        # lease finds its job taken over and changes nothing
+        return db.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ? "
+            "AND attempts = ? AND status = 'running'",
+            (*params, job["id"], job["worker"], job["attempts"]),
+        ).rowcount == 1
+
+    def renew(self, job):
+        with self._connect() as db:
+            return self._update_claimed(
+                db, job, "lease_until = ?", (time.time() + self.lease,)
+            )
+
+    def complete(self, job, result=None, next_jobs=()):
+        # the follow-up jobs are queued in the same transaction
+        with self._connect() as db:
+            done = self._update_claimed(
+                db,
+                job,
+                "status = 'done', result = ?, finished = ?",
+                (json.dumps(result), time.time()),
+            )
+            if done:
+                self._insert(db, next_jobs)
+            return done
+
+    def fail(self, job, error):
+        status = "queued" if job["attempts"] < self.max_attempts else "failed"
+        with self._connect() as db:
+            return self._update_claimed(
+                db,
+                job,
+                "status = ?, error = ?, finished = ?",
+                (status, error, time.time() if status == "failed" else None),
+            )
+
+    def counts(self):
+        with self._connect() as db:
+            return db.execute(
+                "SELECT stage, status, COUNT(*) FROM jobs "
+                "GROUP BY stage, status ORDER BY stage, status"
+            ).fetchall()
+
+
+class Worker:
+    # Runs jobs of the given stages one at a time. The lease is renewed
+    # every heartbeat seconds; when it is lost anyway, the ffmpeg runs of
+    # the job are cancelled so two workers never write the same files.
+    def __init__(self, queue, stages=None, worker_id=None):
+        self.queue = queue
+        self.stages = list(stages or STAGES)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat = jobs_config.get("heartbeat", 20)
+        self.poll_interval = jobs_config.get("poll_interval", 2)
+        self.stop_event = threading.Event()
+
+    def log(self, message):
+        utils.log_message(f"[{self.worker_id}] {message}", None, None)
+
+    def run(self, once=False):
+        while not self.stop_event.is_set():
+            job = self.queue.claim(self.worker_id, self.stages)
+            if job is None:
+                if once:
+                    return
+                self.stop_event.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        manager = process_manager.get_manager()
+        manager.start_group(job["stage"])
+        done = threading.Event()
+
+        def keep_lease():
+            while not done.wait(self.heartbeat):
+                if not self.queue.renew(job):
+                    self.log(f"lost the lease of job {job['id']}")
+                    manager.cancel_group(job["stage"])
+                    return
+
+        threading.Thread(target=keep_lease, daemon=True).start()
+        self.log(f"job {job['id']}: {job['stage']} (attempt {job['attempts']})")
+        try:
+            # every stage reads the source: no sweep may evict it meanwhile
+            with artifact_store.in_use(local_path(job["payload"]["source"])):
+                result, next_jobs = STAGES[job["stage"]](job["payload"])
+            self.queue.complete(job, result, next_jobs)
+            self.log(f"job {job['id']} done")
+        except Exception as e:
+            self.log(f"job {job['id']} failed: {type(e).__name__}: {e}")
+            self.queue.fail(job, f"{type(e).__name__}: {e}")
+        finally:
+            done.set()
+            manager.finish_group(job["stage"])
+
+
+def _use_settings(payload):
+    # the GUI's settings travel with the job
+    config_manager.set_language(payload["language"])
+    config_manager.set_whisper_profile(payload["profile"])
+
+
+@stage("transcribe")
+def transcribe_stage(payload):
+    _use_settings(payload)
+    source = local_path(payload["source"])
+    output_dir = local_path(payload["output_dir"])
+    base_name = slugify(source.stem)
+    output_wav = output_dir / f"{base_name}.wav"
+    output_srt = output_dir / f"{base_name}.srt"
+    manifest = Manifest(output_dir)
+    srt_params = {
+        "profile": utils.get_whisper_profile(),
+        "language": payload["language"],
+    }
+    artifact_store.touch(source)
+    if not manifest.is_fresh("srt", [source], srt_params):
+        with artifact_store.in_use(output_wav):
+            if not manifest.is_fresh("wav", [source]):
+                utils.make_wav_from_video(
+                    input_video_path=source.as_posix(),
+                    output_audio_path=output_wav,
+                    log_box=None,
+                    tk=None,
+                )
+                if not output_wav.exists():
+                    raise RuntimeError(f"ffmpeg failed to decode {source.name}")
+                manifest.record("wav", output_wav, [source])
+            utils.make_srt_file_from_audio(output_wav, output_srt, None, None)
+            manifest.record("srt", output_srt, [source], srt_params)
+            os.remove(output_wav)
+    return {"srt": shared_path(output_srt)}, [
+        ("detect", {**payload, "srt": shared_path(output_srt)})
+    ]
+
+
+@stage("detect")
+def detect_stage(payload):
+    _use_settings(payload)
+    source = local_path(payload["source"])
+    output_dir = local_path(payload["output_dir"])
+    segments = subtitle_processing.get_interest_segments(
+        local_path(payload["srt"]).as_posix(),
+        payload["language"],
+        payload["threshold"],
+        source_file=source.as_posix(),
+        update_corpus=True,
+    )
+    clips = []
+    for i, timecode in enumerate(
+        subtitle_processing.segments_to_timecodes(segments), 1
+    ):
+        start, end = timecode.split(" - ")
+        clip_path = output_dir / f"clip_{i:02d}{source.suffix}"
+        clips.append(
+            {"filename": shared_path(clip_path), "start": start, "end": end}
+        )
+    # the clip names are known up front, so clips.json is written once here
+    with open(output_dir / "clips.json", "w", encoding="utf-8") as f:
+        json.dump(clips, f, ensure_ascii=False, indent=4)
+    return {"clips": len(clips)}, [
+        (
+            "cut",
+            {
+                **payload,
+                "clip": clip["filename"],
+                "start": clip["start"],
+                "end": clip["end"],
+            },
+        )
+        for clip in clips
+    ]
+
+
+@stage("cut")
+def cut_stage(payload):
+    source = local_path(payload["source"])
+    clip_path = local_path(payload["clip"])
+    manifest = Manifest(clip_path.parent)
+    clip_params = {
+        "start": payload["start"],
+        "end": payload["end"],
+        "source_url": "",
+    }
+    loudness_settings = loudness.clip_settings()
+    if loudness_settings:
+        clip_params["loudness"] = loudness_settings
+    if not manifest.is_fresh(clip_path.stem, [source], clip_params):
+        gain = loudness.clip_gain(
+            source,
+            utils.parse_timecode(payload["start"]),
+            utils.parse_timecode(payload["end"]),
+            group="cut",
+        )
+        return_code = video_processing.cut_clip(
+            source.as_posix(),
+            payload["start"],
+            payload["end"],
+            clip_path,
+            None,
+            None,
+            gain=gain,
+        )
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg failed to cut {clip_path.name}")
+        manifest.record(clip_path.stem, clip_path, [source], clip_params)
+        try:
+            fingerprint_index.get_index().add_clip(
+                clip_path,
+                fingerprint_index.source_hash(source),
+                utils.parse_timecode(payload["start"]),
+                utils.parse_timecode(payload["end"]),
+                group="cut",
+            )
+        except RuntimeError as e:
+            utils.log_message(f"ERROR: {e}", None, None)
+    artifact_store.touch(clip_path)
+    return {"clip": payload["clip"]}, [("burn", payload)]
+
+
+@stage("burn")
+def burn_stage(payload):
+    # the clip's .srt, the burned copy when [subtitles] burn is on, and the
+    # entry in the account's upload ledger
+    clip_path = local_path(payload["clip"])
+    subs_path = local_path(payload["srt"])
+    video_path = video_processing.subtitle_clip(
+        clip_path,
+        Transcript.from_srt(subs_path),
+        subs_path,
+        int(round(utils.parse_timecode(payload["start"]) * 1000)),
+        int(round(utils.parse_timecode(payload["end"]) * 1000)),
+        Manifest(clip_path.parent),
+        None,
+        None,
+    )
+    if video_path is None:
+        raise RuntimeError(f"ffmpeg failed to burn subtitles into {clip_path.name}")
+    artifact_store.touch(clip_path, video_path)
+    if payload.get("account"):
+        video_processing.queue_upload(local_path(payload["account"]), video_path)
+    return {"video": shared_path(video_path)}, []
+
+
+def submit_source(source, account_json=None, threshold=0.7, queue=None):
+    # the whole pipeline for one source: transcribe queues detect, which
+    # queues a cut per moment, each of which queues its burn
+    source = Path(source).resolve()
+    payload = {
+        "source": shared_path(source),
+        "output_dir": shared_path(utils.get_output_dir(source)),
+        "language": config_manager.get_language(),
+        "profile": config_manager.get_whisper_profile(),
+        "threshold": threshold,
+        "account": shared_path(account_json) if account_json else None,
+    }
+    return (queue or JobQueue()).submit("transcribe", payload)
+
+
+def send_to_workers(label, log_box, tk):
+    source = config_manager.get_source_file_path()
+    if not source:
+        label.config(text="Select video file", foreground="red")
+        return
+    job_id = submit_source(source, config_manager.get_account_config()["json"])
+    utils.log_message(f"Queued {Path(source).name} as job {job_id}", log_box, tk)
+    label.config(text=f"Queued: job {job_id}", foreground="green")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    submit = commands.add_parser("submit")
+    submit.add_argument("sources", nargs="+", type=Path)
+    submit.add_argument("--account")
+    submit.add_argument("--language", default=config_manager.get_language())
+    submit.add_argument("--profile", default=config_manager.get_whisper_profile())
+    submit.add_argument("--threshold", type=float, default=0.7)
+    worker = commands.add_parser("worker")
+    worker.add_argument("--stages", default=",".join(STAGES))
+    worker.add_argument("--once", action="store_true")
+    commands.add_parser("status")
+    args = parser.parse_args()
+
+    queue = JobQueue()
+    if args.command == "submit":
+        config_manager.set_language(args.language)
+        config_manager.set_whisper_profile(args.profile)
+        account_json = None
+        if args.account:
+            account_json = config_manager.account_jsons[args.account]["json"]
+        for source in args.sources:
+            job_id = submit_source(source, account_json, args.threshold, queue)
+            print(f"{source.name}: job {job_id}")
+    elif args.command == "worker":
+        Worker(queue, stages=args.stages.split(",")).run(once=args.once)
+    else:
+        for name, status, count in queue.counts():
+            print(f"{name:<12} {status:<8} {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import json
+import os
+import threading
+import time
+import wave
+from pathlib import Path
+import shutil
+from tkinter import messagebox
+
+import toml
+import yt_dlp
+from slugify import slugify
+
+import context_video_cutter.artifact_store as artifact_store
+import context_video_cutter.config_manager as config_manager
+import context_video_cutter.fingerprint_index as fingerprint_index
+import context_video_cutter.process_manager as process_manager
+import context_video_cutter.subtitle_processing as subtitle_processing
+import context_video_cutter.utils as utils
+import context_video_cutter.video_processing as video_processing
+from context_video_cutter.shared_paths import shared_path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+live_config = config.get("live", {})
+
+# a live HLS stream has no separate tracks to merge while it grows
+LIVE_FORMAT = "best[height<=720]/best"
+
+_current = None
+_current_lock = threading.Lock()
+
+
+class LiveRecording:
+    # yt-dlp live download into a plain MPEG-TS file (no .part), so the
+    # file can be read while it grows
+    def __init__(self, url, logger=None):
+        self.stop_event = threading.Event()
+        self.error = None
+        ydl_opts = {
+            "format": LIVE_FORMAT,
+            "outtmpl": Path(BASE_DIR / config["paths"]["sources_dir"]).as_posix()
+            + "/%(title)s.%(ext)s",
+            "noplaylist": True,
+            "hls_use_mpegts": True,
+            "nopart": True,
+            "logger": logger,
+            "progress_hooks": [self._check_stop],
+        }
+        os.makedirs(BASE_DIR / config["paths"]["sources_dir"], exist_ok=True)
+        self.ydl = yt_dlp.YoutubeDL(ydl_opts)
+        self.info = self.ydl.extract_info(url, download=False)
+        self.path = Path(self.ydl.prepare_filename(self.info))
+        self.thread = threading.Thread(target=self._download, daemon=True)
+        self.thread.start()
+
+    def _check_stop(self, d):
+        if self.stop_event.is_set():
+            raise yt_dlp.utils.DownloadCancelled("Recording stopped")
+
+    def _download(self):
+        try:
+            self.ydl.process_ie_result(self.info, download=True)
+        except yt_dlp.utils.DownloadCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ydl.close()
+
+    def is_recording(self):
+        return self.thread.is_alive()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class LiveIngest:
+    # Follows a growing recording: transcribes it window by window into
+    # <slug>.live.srt, detects moments over the latest part of the
+    # transcript and cuts every moment as soon as the talk has moved past it.
+    def __init__(self, source_path, log_box=None, tk=None, recording=None):
+        self.source_path = Path(source_path)
+        self.log_box = log_box
+        self.tk = tk
+        self.recording = recording
+        self.language = config_manager.get_language()
+        self.output_dir = utils.get_output_dir(self.source_path)
+        self.base_name = slugify(self.source_path.stem)
+        self.srt_path = self.output_dir / f"{self.base_name}.live.srt"
+        self.clips_json_path = self.output_dir / "live_clips.json"
+        self.window = live_config.get("window", 60)
+        self.poll_interval = live_config.get("poll_interval", 10)
+        self.detect_window = live_config.get("detect_window", 900)
+        self.clips_per_window = live_config.get("clips_per_window", 3)
+        self.idle_timeout = live_config.get("idle_timeout", 120)
+        self.threshold = live_config.get("threshold", 0.7)
+
+        # seconds of the source transcribed and committed to the .srt
+        self.position = 0.0
+        self.subtitles = []
+        self.clips = []
+        self.index = fingerprint_index.get_index()
+        self.source_hash = None
+        self.finish_event = threading.Event()
+
+    def log(self, message):
+        utils.log_message(message, self.log_box, self.tk)
+
+    def finish(self):
+        # the recording is over: what is left is transcribed and cut
+        if self.recording:
+            self.recording.stop()
+        self.finish_event.set()
+
+    def run(self):
+        open(self.srt_path, "w", encoding="utf-8").close()
+        last_size = -1
+        last_growth = time.monotonic()
+        while True:
+            size = self.source_path.stat().st_size if self.source_path.exists() else 0
+            if size != last_size:
+                last_size, last_growth = size, time.monotonic()
+            if self.recording:
+                finished = not self.recording.is_recording()
+            else:
+                finished = (
+                    self.finish_event.is_set()
+                    or time.monotonic() - last_growth > self.idle_timeout
+                )
+            if self.step(final=finished):
+                self.detect(final=False)
+            elif finished:
+                break
+            else:
+                self.finish_event.wait(self.poll_interval)
+        # the end of the recording closes the last moment too
+        if self.subtitles:
+            self.detect(final=True)
+            # the rolling windows are only scored; the corpus counts the
+            # whole transcript once, now that it is complete
+            subtitle_processing.update_corpus(
+                self.srt_path, self.language, self.threshold
+            )
+
+    def step(self, final):
+        # transcribe the next window; False if there is not a full one yet
+        if not self.source_path.exists():
+            return False
+        window_wav = self.output_dir / f"{self.base_name}.live.wav"
+        with artifact_store.in_use(window_wav):
+            try:
+                utils.make_wav_from_video(
+                    input_video_path=self.source_path.as_posix(),
+                    output_audio_path=window_wav,
+                    log_box=self.log_box,
+                    tk=self.tk,
+                    start=self.position,
+                    end=self.position + self.window,
+                    group="live",
+                )
+                if not window_wav.exists():
+                    return False
+                with wave.open(window_wav.as_posix()) as wav:
+                    available = wav.getnframes() / wav.getframerate()
+                if available < 1 or (available < self.window and not final):
+                    return False
+                subtitles = utils.transcribe_audio(
+                    window_wav, self.log_box, self.tk, offset=self.position
+                )
+            finally:
+                if window_wav.exists():
+                    os.remove(window_wav)
+
+        next_position = self.position + available
+        if not final and len(subtitles) > 1:
+            # the last segment may be cut off by the window edge: it is
+            # transcribed again at the start of the next window
+            last_start = subtitles[-1].start.total_seconds()
+            if last_start > self.position:
+                next_position = last_start
+                subtitles = subtitles[:-1]
+        self.append_subtitles(subtitles)
+        self.position = next_position
+        return True
+
+    def append_subtitles(self, subtitles):
+        with open(self.srt_path, "a", encoding="utf-8") as f:
+            for subtitle in subtitles:
+                subtitle.index = len(self.subtitles) + 1
+                self.subtitles.append(subtitle)
+                f.write(subtitle.to_srt())
+
+    def detect(self, final):
+        # moments of the last detect_window seconds; the first one may have
+        # started before the window and the last one may still go on, so
+        # both are only cut once the recording is over. Scoring leaves the
+        # ranking corpus alone (see run).
+        window_start = self.position - self.detect_window
+        recent = [
+            subtitle
+            for subtitle in self.subtitles
+            if subtitle.start.total_seconds() >= window_start
+        ]
+        if len(recent) < 2:
+            return
+        rolling_srt = self.output_dir / f"{self.base_name}.rolling.srt"
+        utils.write_srt_file(recent, rolling_srt)
+        try:
+            segments = subtitle_processing.get_interest_segments(
+                rolling_srt, self.language, self.threshold, n=self.clips_per_window
+            )
+        finally:
+            os.remove(rolling_srt)
+        first_ms = int(recent[0].start.total_seconds() * 1000)
+        last_ms = int(recent[-1].end.total_seconds() * 1000)
+        for segment in segments:
+            if not final and (
+                segment["end"] >= last_ms
+                or (segment["start"] <= first_ms and window_start > 0)
+            ):
+                continue
+            self.cut(segment["start"] / 1000, segment["end"] / 1000)
+
+    def cut(self, start, end):
+        if self.source_hash is None:
+            self.source_hash = fingerprint_index.source_hash(self.source_path)
+        if self.index.overlapping_clip(self.source_hash, start, end):
+            return
+        clip_path = (
+            self.output_dir
+            / f"live_clip_{len(self.clips) + 1:02d}{self.source_path.suffix}"
+        )
+        start_tc, end_tc = utils.format_timecode(start), utils.format_timecode(end)
+        return_code = video_processing.cut_clip(
+            self.source_path.as_posix(),
+            start_tc,
+            end_tc,
+            clip_path,
+            self.log_box,
+            self.tk,
+            group="live",
+        )
+        if return_code != 0:
+            self.log(f"ERROR: cutting {start_tc} - {end_tc} failed")
+            return
+        self.index.add_clip(clip_path, self.source_hash, start, end, group="live")
+        self.clips.append(
+            {"filename": shared_path(clip_path), "start": start_tc, "end": end_tc}
+        )
+        with open(self.clips_json_path, "w", encoding="utf-8") as f:
+            json.dump(self.clips, f, ensure_ascii=False, indent=4)
+        self.log(f"{clip_path.name}: {start_tc} - {end_tc}")
+
+
+def start_live_ingest(url, labels, log_box, tk):
+    # url: a live stream to record, or empty to follow the selected source
+    # file while another program records it
+    manager = process_manager.get_manager()
+    if not manager.start_group("live"):
+        messagebox.showwarning("Error", "Live ingest is already running.")
+        return
+
+    def worker():
+        global _current
+        labels["live_label"].config(text="Starting…", foreground="blue")
+        try:
+            recording = None
+            if url:
+                recording = LiveRecording(url, logger=utils.YTDLPLogger(log_box, tk))
+                source_path = recording.path
+                config_manager.set_source_url("")
+            else:
+                source_path = config_manager.get_source_file_path()
+                if not source_path:
+                    raise ValueError("Select video file or paste a live link")
+            ingest = LiveIngest(source_path, log_box, tk, recording)
+            with _current_lock:
+                _current = ingest
+            config_manager.set_source_file_path(Path(source_path).as_posix())
+            labels["live_label"].config(text="Live", foreground="green")
+            ingest.run()
+            if recording and recording.error:
+                raise recording.error
+            config_manager.set_subs_file_path(ingest.srt_path)
+            config_manager.set_clips_json_path(ingest.clips_json_path)
+            labels["live_label"].config(
+                text=f"Done: {len(ingest.clips)} clips", foreground="green"
+            )
+        except process_manager.JobCancelled:
+            labels["live_label"].config(text="Stopped", foreground="red")
+        except Exception as e:
+            labels["live_label"].config(text=f"Error: {e}", foreground="red")
+        finally:
+            with _current_lock:
+                _current = None
+            manager.finish_group("live")
+
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def finish_live_ingest():
+    with _current_lock:
+        ingest = _current
+    if ingest is not None:
+        ingest.finish()
@@ -0,0 +1,158 @@
+import os
+import re
+from pathlib import Path
+import shutil
+
+import numpy as np
+import toml
+from slugify import slugify
+
+import context_video_cutter.artifact_store as artifact_store
+import context_video_cutter.process_manager as process_manager
+import context_video_cutter.utils as utils
+from context_video_cutter.manifest import Manifest
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+loudness_config = config.get("loudness", {})
+
+# BS.1770 gating blocks: 400 ms momentary loudness every 100 ms, which is
+# what ebur128 reports when it gets one 100 ms frame at a time
+RATE = 48000
+STEP = 0.1
+BLOCK = 0.4
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+PTS_LINE = re.compile(r"\bpts_time:\s*(-?[\d.]+)")
+MOMENTARY_LINE = re.compile(r"lavfi\.r128\.M=(-?[\d.]+|-?inf)")
+# containers that take no AAC; everything else gets AAC
+OPUS_SUFFIXES = {".webm", ".ogg", ".opus"}
+
+
+def measure(source_path, log_box=None, tk=None, group=None):
+    # one streaming pass over the audio; returns (t0, momentary) with
+    # momentary[k] the loudness (LUFS) of the block ending at
+    # t0 + (k + 1) * STEP
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-i",
+        Path(source_path).as_posix(),
+        "-vn",
+        "-sn",
+        "-af",
+        f"aresample={RATE},asetnsamples=n={int(RATE * STEP)}:p=0,"
+        "ebur128=metadata=1:framelog=quiet,"
+        "ametadata=mode=print:key=lavfi.r128.M",
+        "-f",
+        "null",
+        "-",
+    ]
+    times = []
+    momentary = []
+
+    def on_output(line):
+        match = MOMENTARY_LINE.search(line)
+        if match:
+            momentary.append(float(match.group(1)))
+            return
+        match = PTS_LINE.search(line)
+        if match:
+            times.append(float(match.group(1)))
+        elif "Parsed_ametadata" not in line:
+            utils.log_message(line, log_box, tk)
+
+    return_code = process_manager.get_manager().run(
+        cmd, group=group, on_output=on_output
+    )
+    if return_code != 0:
+        raise RuntimeError(f"ffmpeg failed to measure {Path(source_path).name}")
+    t0 = times[0] if times else 0.0
+    return t0, np.array(momentary, dtype=np.float32)
+
+
+def get_series(source_path, log_box=None, tk=None, group=None):
+    # cached next to the other per-source artifacts as float16 (a few
+    # hundredths of a LU, plenty for a gain): about 70 KB per hour of audio
+    source_path = Path(source_path)
+    base_name = slugify(source_path.stem)
+    current_output_dir = utils.get_output_dir(source_path)
+    series_path = current_output_dir / f"{base_name}.loudness.npz"
+    manifest = Manifest(current_output_dir)
+    if manifest.is_fresh("loudness", [source_path]):
+        artifact_store.touch(series_path)
+        with np.load(series_path) as data:
+            return float(data["t0"]), data["momentary"].astype(np.float32)
+
+    t0, momentary = measure(source_path, log_box, tk, group)
+    # written aside and moved in place: workers cutting other clips of the
+    # same source may be reading it
+    tmp_path = series_path.with_suffix(".tmp.npz")
+    np.savez(
+        tmp_path,
+        t0=np.float64(t0),
+        momentary=np.maximum(momentary, -120).astype(np.float16),
+    )
+    os.replace(tmp_path, series_path)
+    manifest.record("loudness", series_path, [source_path])
+    artifact_store.touch(series_path)
+    return t0, momentary
+
+
+def integrated_loudness(t0, momentary, start, end):
+    # BS.1770 integrated loudness of [start, end] from the blocks inside it:
+    # absolute gate, then a relative gate 10 LU under the gated mean
+    block_ends = t0 + STEP * np.arange(1, len(momentary) + 1)
+    blocks = momentary[(block_ends - BLOCK >= start - 1e-6) & (block_ends <= end)]
+    blocks = blocks[blocks > ABSOLUTE_GATE]
+    if not len(blocks):
+        return None
+    energy = 10 ** ((blocks.astype(np.float64) + 0.691) / 10)
+    relative_gate = -0.691 + 10 * np.log10(energy.mean()) + RELATIVE_GATE
+    energy = energy[blocks > relative_gate]
+    return float(-0.691 + 10 * np.log10(energy.mean()))
+
+
+def clip_settings():
+    # what a clip's gain depends on besides its source and range: part of
+    # the clip's manifest params, so a fresh clip needs no measurement
+    if not loudness_config.get("enabled", False):
+        return None
+    return {
+        "target": loudness_config.get("target", -14.0),
+        "max_gain": loudness_config.get("max_gain", 12.0),
+        "ceiling": loudness_config.get("ceiling", -1.0),
+        "audio_bitrate": loudness_config.get("audio_bitrate", "192k"),
+    }
+
+
+def clip_gain(source_path, start, end, log_box=None, tk=None, group=None):
+    # dB to bring [start, end] of the source to the target loudness, or
+    # None when normalization is off or the range is silent
+    if not loudness_config.get("enabled", False):
+        return None
+    t0, momentary = get_series(source_path, log_box, tk, group)
+    loudness = integrated_loudness(t0, momentary, start, end)
+    if loudness is None:
+        return None
+    max_gain = loudness_config.get("max_gain", 12.0)
+    gain = loudness_config.get("target", -14.0) - loudness
+    return round(float(np.clip(gain, -max_gain, max_gain)), 2)
+
+
+def gain_filter(gain):
+    # single pass at export: a fixed gain, and a limiter that catches the
+    # peaks a positive gain pushes over the ceiling
+    ceiling = 10 ** (loudness_config.get("ceiling", -1.0) / 20)
+    return f"volume={gain}dB,alimiter=limit={ceiling:.4f}:level=false"
+
+
+def audio_encoder(clip_path):
+    return "libopus" if Path(clip_path).suffix.lower() in OPUS_SUFFIXES else "aac"
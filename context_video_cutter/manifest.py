@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from filelock import FileLock
+
+from context_video_cutter.shared_paths import local_path, shared_path
+
+MANIFEST_NAME = "manifest.json"
+
+
+def file_fingerprint(path):
+    # by shared path: the same file has the same digest on every machine
+    path = local_path(path)
+    if not path.exists():
+        return [shared_path(path), None, None]
+    stat = path.stat()
+    return [shared_path(path), stat.st_size, stat.st_mtime_ns]
+
+
+class Manifest:
+    # Per-source record of every artifact in the output dir, with a digest
+    # of its input files and parameters. An artifact is rebuilt only when
+    # the digest changed or the file is gone. Paths are stored as shared
+    # paths, so job workers and the GUI read each other's records.
+    def __init__(self, output_dir):
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self.lock = FileLock(self.path.as_posix() + ".lock")
+
+    def _read(self):
+        if not self.path.exists():
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def digest(inputs=(), params=None):
+        payload = json.dumps(
+            {
+                "inputs": [file_fingerprint(path) for path in inputs],
+                "params": params or {},
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def is_fresh(self, name, inputs=(), params=None):
+        entry = self._read().get(name)
+        return (
+            entry is not None
+            and local_path(entry["path"]).exists()
+            and entry["digest"] == self.digest(inputs, params)
+        )
+
+    def get_path(self, name):
+        entry = self._read().get(name)
+        return local_path(entry["path"]) if entry else None
+
+    def find(self, path):
+        # the entry an artifact file was recorded under, or None
+        path = Path(path).resolve()
+        for entry in self._read().values():
+            if local_path(entry["path"]).resolve() == path:
+                return entry
+        return None
+
+    def record(self, name, path, inputs=(), params=None):
+        # re-read under the lock: other stages may be recording meanwhile
+        with self.lock:
+            artifacts = self._read()
+            artifacts[name] = {
+                "path": shared_path(path),
+                "inputs": [shared_path(p) for p in inputs],
+                "params": params or {},
+                "digest": self.digest(inputs, params),
+                "created": datetime.now().isoformat(timespec="seconds"),
+            }
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(artifacts, f, ensure_ascii=False, indent=4, default=str)
+            os.replace(tmp_path, self.path)
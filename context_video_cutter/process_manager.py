@@ -0,0 +1,213 @@
+import asyncio
+import concurrent.futures
+import os
+import signal
+import subprocess
+import threading
+from contextlib import AsyncExitStack
+from pathlib import Path
+import shutil
+
+import toml
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+processes_config = config.get("processes", {})
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, cmd, group, resources, timeout, outputs, on_output, cwd):
+        self.cmd = [str(part) for part in cmd]
+        self.group = group
+        self.resources = sorted(resources)
+        self.timeout = timeout
+        self.outputs = [Path(output) for output in outputs]
+        self.on_output = on_output
+        self.cwd = cwd
+        self.process = None
+        self.future = None
+        self.task = None
+        self.loop = None
+
+    def cancel(self):
+        # a started job is cancelled inside the loop, so result() only
+        # returns once the process is killed and its outputs are removed
+        if self.task is not None:
+            self.loop.call_soon_threadsafe(self.task.cancel)
+        else:
+            self.future.cancel()
+
+    def result(self, timeout=None):
+        # return code of the process; JobCancelled / JobTimeout otherwise
+        try:
+            return self.future.result(timeout)
+        except concurrent.futures.CancelledError:
+            raise JobCancelled(" ".join(self.cmd)) from None
+
+
+class ProcessManager:
+    # Runs every external tool (ffmpeg, ...) on one asyncio loop in a
+    # background thread. A job holds a global slot plus one slot per
+    # resource it uses (e.g. "cpu", "disk") while its process runs.
+    def __init__(self, max_jobs=None, resource_limits=None):
+        self.max_jobs = max_jobs or processes_config.get("max_jobs", 4)
+        self.resource_limits = resource_limits or {
+            "cpu": processes_config.get("cpu", 2),
+            "disk": processes_config.get("disk", 2),
+        }
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.global_slots = asyncio.Semaphore(self.max_jobs)
+        self.resource_slots = {
+            name: asyncio.Semaphore(limit)
+            for name, limit in self.resource_limits.items()
+        }
+        self.lock = threading.Lock()
+        self.groups = {}
+        self.cancelled_groups = set()
+
+    def start_group(self, group):
+        # False if the group (e.g. "cut") is already running
+        with self.lock:
+            if group in self.groups:
+                return False
+            self.groups[group] = set()
+            self.cancelled_groups.discard(group)
+            return True
+
+    def finish_group(self, group):
+        with self.lock:
+            self.groups.pop(group, None)
+            self.cancelled_groups.discard(group)
+
+    def is_cancelled(self, group):
+        return group in self.cancelled_groups
+
+    def cancel_group(self, group):
+        with self.lock:
+            if group not in self.groups:
+                return
+            self.cancelled_groups.add(group)
+            jobs = list(self.groups[group])
+        for job in jobs:
+            job.cancel()
+
+    def submit(
+        self,
+        cmd,
+        group=None,
+        resources=("cpu",),
+        timeout=None,
+        outputs=(),
+        on_output=None,
+        cwd=None,
+    ):
+        if timeout is None:
+            timeout = processes_config.get("timeout", 0) or None
+        job = Job(cmd, group, resources, timeout, outputs, on_output, cwd)
+        with self.lock:
+            if group in self.cancelled_groups:
+                raise JobCancelled(" ".join(job.cmd))
+            if group is not None:
+                self.groups.setdefault(group, set()).add(job)
+            job.future = asyncio.run_coroutine_threadsafe(self._run(job), self.loop)
+        job.future.add_done_callback(lambda _: self._forget(job))
+        return job
+
+    def run(self, cmd, **kwargs):
+        return self.submit(cmd, **kwargs).result()
+
+    def _forget(self, job):
+        with self.lock:
+            if job.group in self.groups:
+                self.groups[job.group].discard(job)
+
+    async def _run(self, job):
+        job.loop = self.loop
+        job.task = asyncio.current_task()
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(self.global_slots)
+            for resource in job.resources:
+                await stack.enter_async_context(self.resource_slots[resource])
+            try:
+                job.process = await asyncio.create_subprocess_exec(
+                    *job.cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    cwd=job.cwd,
+                    **_new_process_group_kwargs(),
+                )
+                await asyncio.wait_for(self._pump(job), job.timeout)
+                return_code = await job.process.wait()
+            except asyncio.TimeoutError:
+                await self._abort(job)
+                raise JobTimeout(" ".join(job.cmd)) from None
+            except asyncio.CancelledError:
+                await self._abort(job)
+                raise
+            if return_code != 0:
+                _remove_outputs(job)
+            return return_code
+
+    async def _pump(self, job):
+        async for raw_line in job.process.stdout:
+            if job.on_output:
+                job.on_output(raw_line.decode("utf-8", errors="replace").strip())
+
+    async def _abort(self, job):
+        if job.process and job.process.returncode is None:
+            _kill_tree(job.process.pid)
+            await job.process.wait()
+        _remove_outputs(job)
+
+
+def _new_process_group_kwargs():
+    # own process group, so a cancel also kills the tool's children
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _kill_tree(pid):
+    if os.name == "nt":
+        subprocess.run(
+            ["taskkill", "/F", "/T", "/PID", str(pid)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    else:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _remove_outputs(job):
+    for output in job.outputs:
+        if output.exists():
+            output.unlink()
+
+
+def get_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ProcessManager()
+        return _manager
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from pathlib import Path
+import shutil
+
+import numpy as np
+import toml
+from filelock import FileLock
+from scipy.sparse import vstack
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from spacy.lang.en.stop_words import STOP_WORDS as EN_STOP_WORDS
+from spacy.lang.ru.stop_words import STOP_WORDS as RU_STOP_WORDS
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+ranking_config = config.get("ranking", {})
+
+N_FEATURES = 2**20
+CHUNK_SIZE = 256
+STOP_WORDS = {"en": EN_STOP_WORDS, "ru": RU_STOP_WORDS}
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+class CorpusModel:
+    # TF-IDF over every segment ever ranked: terms are hashed into a fixed
+    # feature space, so the model is just document frequencies per bucket
+    # and never has to be refit.
+    def __init__(self, language="en", model_dir=None, n_features=N_FEATURES):
+        self.language = language
+        self.n_features = n_features
+        model_dir = Path(
+            model_dir or BASE_DIR / ranking_config.get("model_dir", "models/ranking")
+        )
+        os.makedirs(model_dir, exist_ok=True)
+        self.path = model_dir / f"corpus_{language}.npz"
+        self.lock = FileLock(self.path.as_posix() + ".lock")
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+            stop_words=sorted(STOP_WORDS.get(language, ())),
+        )
+        self.doc_freq, self.n_docs, self.sources = self._load()
+
+    def _load(self):
+        # sources: keys of the transcripts already counted
+        if self.path.exists():
+            with np.load(self.path) as data:
+                sources = set(data["sources"].tolist()) if "sources" in data else set()
+                return data["doc_freq"], int(data["n_docs"]), sources
+        return np.zeros(self.n_features, dtype=np.int32), 0, set()
+
+    def update(self, counts, key):
+        # Every transcript is counted once: re-running detection on it
+        # (another threshold, a batch rerun, a resume) must not make its
+        # words look common. False if key was counted already.
+        # Rows of a CSR matrix hold each column at most once, so counting
+        # column indices gives document frequencies.
+        doc_freq_delta = np.bincount(counts.indices, minlength=self.n_features)
+        # re-read under the lock: other processes may have updated the model
+        with self.lock:
+            doc_freq, n_docs, sources = self._load()
+            counted = key in sources
+            if not counted:
+                doc_freq = (doc_freq + doc_freq_delta).astype(np.int32)
+                n_docs += counts.shape[0]
+                sources.add(key)
+                tmp_path = self.path.with_suffix(".tmp.npz")
+                np.savez_compressed(
+                    tmp_path,
+                    doc_freq=doc_freq,
+                    n_docs=n_docs,
+                    sources=np.array(sorted(sources), dtype=str),
+                )
+                os.replace(tmp_path, self.path)
+        self.doc_freq, self.n_docs, self.sources = doc_freq, n_docs, sources
+        return not counted
+
+    def add_documents(self, texts, key):
+        if texts:
+            return self.update(self.vectorizer.transform(texts), key)
+        return False
+
+    def idf(self):
+        # same smoothing as sklearn's TfidfVectorizer
+        return (
+            np.log((1 + self.n_docs) / (1 + self.doc_freq.astype(np.float32))) + 1
+        ).astype(np.float32)
+
+    def score(self, texts, update=False, key=None, time_limit=None):
+        # Segments are transformed in interleaved chunks so that, when the
+        # time limit is hit, the scored part still covers the whole video.
+        # Unscored segments get -inf. With update, all the segments are
+        # counted into the corpus under key (see update), scored or not.
+        scores = np.full(len(texts), -np.inf, dtype=np.float32)
+        if not texts:
+            return scores
+        deadline = time.monotonic() + time_limit if time_limit else None
+        n_chunks = max(1, -(-len(texts) // CHUNK_SIZE))
+
+        done = []
+        counts = []
+        for k in range(n_chunks):
+            if deadline and done and time.monotonic() > deadline:
+                break
+            chunk = np.arange(k, len(texts), n_chunks)
+            counts.append(self.vectorizer.transform([texts[i] for i in chunk]))
+            done.append(chunk)
+
+        indices = np.concatenate(done)
+        counts = vstack(counts).tocsr()
+        if update and len(done) == n_chunks:
+            self.update(counts, key)
+        elif update:
+            # key is marked as counted, so a partial count could never be
+            # completed later
+            self.add_documents(texts, key)
+        tfidf = normalize(counts.multiply(self.idf()).tocsr())
+        scores[indices] = np.asarray(tfidf.sum(axis=1)).ravel()
+        return scores
+
+
+def get_corpus_model(language="en"):
+    with _models_lock:
+        if language not in _models:
+            _models[language] = CorpusModel(language)
+        return _models[language]
@@ -0,0 +1,37 @@
+from pathlib import Path
+import shutil
+
+import toml
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+
+# Paths written to jobs, manifests, clips.json and account ledgers are
+# stored relative to the shared folders ("results:<relative path>"), so
+# every machine can mount them at its own place.
+SHARED_ROOTS = {
+    "results": BASE_DIR / config["paths"]["output_dir_base"],
+    "sources": BASE_DIR / config["paths"]["sources_dir"],
+}
+
+
+def shared_path(path):
+    # a value that is shared already is returned as it is
+    path = local_path(Path(path).as_posix()).resolve()
+    for root_name, root in SHARED_ROOTS.items():
+        if path.is_relative_to(root.resolve()):
+            return f"{root_name}:{path.relative_to(root.resolve()).as_posix()}"
+    return path.as_posix()
+
+
+def local_path(value):
+    root_name, separator, relative = str(value).partition(":")
+    if separator and root_name in SHARED_ROOTS:
+        return SHARED_ROOTS[root_name] / relative
+    return Path(value)
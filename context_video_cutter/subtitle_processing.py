@@ -1,19 +1,22 @@
+import hashlib
 import threading
 import os
-from datetime import datetime, timedelta
 from pathlib import Path
 import shutil
 from tkinter import messagebox
 
-import pysrt
-import spacy
-
 import toml
-from sklearn.feature_extraction.text import TfidfVectorizer
 from slugify import slugify
 
 import context_video_cutter.utils as utils
+import context_video_cutter.artifact_store as artifact_store
+import context_video_cutter.audio_features as audio_features
+import context_video_cutter.embeddings as embeddings
 import context_video_cutter.config_manager as config_manager
+import context_video_cutter.process_manager as process_manager
+import context_video_cutter.ranking as ranking
+from context_video_cutter.manifest import Manifest
+from context_video_cutter.transcript import Transcript
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 config_path = BASE_DIR / "config.toml"
@@ -32,35 +35,53 @@ def transcribe_video(labels, log_box, tk):
         messagebox.showerror("Error", "Select video file")
         return
 
+    manager = process_manager.get_manager()
+    if not manager.start_group("transcribe"):
+        messagebox.showwarning("Error", "Subtitles are already being generated.")
+        return
     labels["subtitle_label"].config(text="Status: In progress", style="Blue.TLabel")
 
     video_path = Path(video)
     base_name = slugify(video_path.stem)
-    current_output_dir = (
-        BASE_DIR
-        / config["paths"]["output_dir_base"]
-        / datetime.today().strftime("%d.%m.%Y")
-        / base_name
-    )
-    os.makedirs(current_output_dir, exist_ok=True)
+    current_output_dir = utils.get_output_dir(video_path)
     output_wav = current_output_dir / f"{base_name}.wav"
     output_srt = current_output_dir / f"{base_name}.srt"
+    manifest = Manifest(current_output_dir)
+    srt_params = {
+        "profile": utils.get_whisper_profile(),
+        "language": config_manager.get_language(),
+    }
 
     def worker():
         try:
-            utils.make_wav_from_video(
-                input_video_path=video,
-                output_audio_path=output_wav,
-                log_box=log_box,
-                tk=tk,
-            )
-            utils.make_srt_file_from_audio(
-                input_file_path=output_wav,
-                output_file_path=output_srt,
-                log_box=log_box,
-                tk=tk,
-            )
-            os.remove(output_wav)
+            artifact_store.touch(video_path)
+            if manifest.is_fresh("srt", [video_path], srt_params):
+                utils.log_message(
+                    f"{output_srt.name} is up to date, skipping", log_box, tk
+                )
+            else:
+                # a finished WAV is kept when Whisper fails or is cancelled,
+                # so the next run starts from it
+                with artifact_store.in_use(output_wav):
+                    if not manifest.is_fresh("wav", [video_path]):
+                        utils.make_wav_from_video(
+                            input_video_path=video,
+                            output_audio_path=output_wav,
+                            log_box=log_box,
+                            tk=tk,
+                        )
+                        if output_wav.exists():
+                            manifest.record("wav", output_wav, [video_path])
+                    if manager.is_cancelled("transcribe"):
+                        raise process_manager.JobCancelled()
+                    utils.make_srt_file_from_audio(
+                        input_file_path=output_wav,
+                        output_file_path=output_srt,
+                        log_box=log_box,
+                        tk=tk,
+                    )
+                    manifest.record("srt", output_srt, [video_path], srt_params)
+                    os.remove(output_wav)
             status_text = (
                 "Status: Ready ✅" if output_srt.exists() else "Status: Not ready ❌"
             )
@@ -75,6 +96,13 @@ def transcribe_video(labels, log_box, tk):
                 text=Path(output_srt).name, style="Green.TLabel"
             )
             config_manager.set_subs_file_path(output_srt)
+        except process_manager.JobCancelled:
+            labels["subtitle_label"].after(
+                0,
+                lambda: labels["subtitle_label"].config(
+                    text="Status: Cancelled", foreground="red"
+                ),
+            )
         except Exception as e:
             labels["subtitle_label"].after(
                 0,
@@ -82,28 +110,156 @@ def transcribe_video(labels, log_box, tk):
                     text=f"Error: {e}", foreground="red"
                 ),
             )
+        finally:
+            manager.finish_group("transcribe")
+
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def cancel_transcription():
+    # stops ffmpeg right away; a running Whisper pass finishes its range first
+    process_manager.get_manager().cancel_group("transcribe")
+
+
+def merge_ranges(ranges, margin):
+    # widen every range by the margin and join the ones that touch, so
+    # overlapping clips are decoded and transcribed only once
+    merged = []
+    for start, end in sorted(ranges):
+        start, end = max(0.0, start - margin), end + margin
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def transcribe_ranges(labels, log_box, tk, timecodes_textbox):
+    os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
+    video = config_manager.get_source_file_path()
+    if not video:
+        messagebox.showerror("Error", "Select video file")
+        return
+
+    ranges = []
+    for line in utils.get_timecode_lines(timecodes_textbox, tk):
+        try:
+            start, end = line.strip().split(" - ")
+            ranges.append((utils.parse_timecode(start), utils.parse_timecode(end)))
+        except ValueError:
+            messagebox.showwarning("Error", f"Wrong string format: {line}")
+            return
+    if not ranges:
+        messagebox.showerror("Error", "No timecodes")
+        return
+
+    manager = process_manager.get_manager()
+    if not manager.start_group("transcribe"):
+        messagebox.showwarning("Error", "Subtitles are already being generated.")
+        return
+    labels["subtitle_label"].config(text="Status: In progress", style="Blue.TLabel")
+
+    video_path = Path(video)
+    base_name = slugify(video_path.stem)
+    current_output_dir = utils.get_output_dir(video_path)
+    output_srt = current_output_dir / f"{base_name}.ranges.srt"
+    margin = config.get("whisper", {}).get("range_margin", 2)
+    merged_ranges = merge_ranges(ranges, margin)
+    manifest = Manifest(current_output_dir)
+    srt_params = {
+        "ranges": merged_ranges,
+        "profile": utils.get_whisper_profile(),
+        "language": config_manager.get_language(),
+    }
+
+    def worker():
+        try:
+            artifact_store.touch(video_path)
+            if manifest.is_fresh("ranges_srt", [video_path], srt_params):
+                utils.log_message(
+                    f"{output_srt.name} is up to date, skipping", log_box, tk
+                )
+            else:
+                subtitles = []
+                for i, (start, end) in enumerate(merged_ranges, 1):
+                    if manager.is_cancelled("transcribe"):
+                        raise process_manager.JobCancelled()
+                    output_wav = current_output_dir / f"{base_name}.range_{i:02d}.wav"
+                    with artifact_store.in_use(output_wav):
+                        utils.make_wav_from_video(
+                            input_video_path=video,
+                            output_audio_path=output_wav,
+                            log_box=log_box,
+                            tk=tk,
+                            start=start,
+                            end=end,
+                        )
+                        subtitles += utils.transcribe_audio(
+                            input_file_path=output_wav,
+                            log_box=log_box,
+                            tk=tk,
+                            offset=start,
+                        )
+                        os.remove(output_wav)
+                utils.write_srt_file(subtitles, output_srt)
+                manifest.record("ranges_srt", output_srt, [video_path], srt_params)
+            labels["subtitle_label"].after(
+                0,
+                lambda: labels["subtitle_label"].config(
+                    text="Status: Ready ✅", foreground="green"
+                ),
+            )
+            labels["selected_subs_label"].config(
+                text=Path(output_srt).name, style="Green.TLabel"
+            )
+            config_manager.set_subs_file_path(output_srt)
+        except process_manager.JobCancelled:
+            labels["subtitle_label"].after(
+                0,
+                lambda: labels["subtitle_label"].config(
+                    text="Status: Cancelled", foreground="red"
+                ),
+            )
+        except Exception as e:
+            labels["subtitle_label"].after(
+                0,
+                lambda: labels["subtitle_label"].config(
+                    text=f"Error: {e}", foreground="red"
+                ),
+            )
+        finally:
+            for range_wav in current_output_dir.glob(f"{base_name}.range_*.wav"):
+                os.remove(range_wav)
+            manager.finish_group("transcribe")
 
     threading.Thread(target=worker, daemon=True).start()
 
 
-import spacy
 import numpy as np
-import pysrt
-from datetime import timedelta
 from tkinter import messagebox
 
 
 def get_interests(label, timecodes_textbox, tk, threshold: float = 0.5):
     label.config(text="Processing…", foreground="blue")
 
-    segments = get_interest_segments(config_manager.get_subs_file_path(), config_manager.get_language())
+    request = {
+        "op": "detect",
+        "srt": Path(config_manager.get_subs_file_path()).resolve().as_posix(),
+        "language": config_manager.get_language(),
+        "source_file": config_manager.get_source_file_path() or None,
+        "update_corpus": True,
+    }
+    # the worker daemon has the language models loaded already
+    segments = utils.daemon_request(request)
+    if segments is None:
+        segments = get_interest_segments(
+            request["srt"],
+            request["language"],
+            source_file=request["source_file"],
+            update_corpus=True,
+        )
 
-    # build timecodes: from first start to last end in each segment
-    interesting_timecodes = []
-    for seg in segments:
-        start = seg[0]["start"].strftime("%H:%M:%S") + ".000"
-        end = seg[-1]["end"].strftime("%H:%M:%S") + ".000"
-        interesting_timecodes.append(f"{start} - {end}")
+    interesting_timecodes = segments_to_timecodes(segments)
 
     # save & display
     config_manager.set_timecodes(interesting_timecodes)
@@ -115,75 +271,112 @@ def get_interests(label, timecodes_textbox, tk, threshold: float = 0.5):
         timecodes_textbox.delete("1.0", tk.END)
         timecodes_textbox.insert("1.0", "\n".join(interesting_timecodes))
 
-def get_interest_segments(srt_file, language="en", threshold: float = 0.7):
+def segments_to_timecodes(segments):
+    # build timecodes: from first start to last end in each segment
+    timecodes = []
+    for seg in segments:
+        start = utils.format_timecode(seg["start"] / 1000)
+        end = utils.format_timecode(seg["end"] / 1000)
+        timecodes.append(f"{start} - {end}")
+    return timecodes
 
-    if language == "ru":
-        nlp = spacy.load("ru_core_news_sm")
-    else:
-        nlp = spacy.load("en_core_web_sm")
-
-    # read .srt and build text blocks
-    subs = pysrt.open(srt_file, encoding="utf-8")
-    blocks = []
-    buf_text = ""
-    buf_start = None
-    for sub in subs:
-        if not buf_text:
-            buf_start = sub.start.to_time()
-        buf_text += sub.text + " "
-        if sub.text.rstrip().endswith((".", "!", "?")):
-            buf_end = sub.end.to_time()
-            blocks.append(
-                {
-                    "text": buf_text.strip(),
-                    "start": buf_start,
-                    "end": buf_end,
-                }
-            )
-            buf_text = ""
+def corpus_key(srt_file):
+    # a transcript is counted into the ranking corpus once, by content, so
+    # a copy or a re-save under another name is still recognised
+    with open(srt_file, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
 
-    # segment into topic‐coherent clusters
-    segments = []
-    current = []
-    prev_vec = None
-    min_duration = timedelta(minutes=1)
-
-    for blk in blocks:
-        vec = nlp(blk["text"]).vector
-        if prev_vec is None:
-            current = [blk]
-        else:
-            # cosine similarity
-            sim = np.dot(prev_vec, vec) / (
-                    np.linalg.norm(prev_vec) * np.linalg.norm(vec) + 1e-8
-            )
 
-            start = current[0]["start"]
-            end = blk["end"]
-            dur = timedelta(
-                hours=end.hour, minutes=end.minute, seconds=end.second
-            ) - timedelta(hours=start.hour, minutes=start.minute, seconds=start.second)
+def split_segments(srt_file, language="en", threshold: float = 0.7):
+    # read .srt and build sentence blocks
+    blocks = Transcript.from_srt(srt_file).sentence_blocks()
 
-            if sim < threshold and dur >= min_duration:
-                segments.append(current)
-                current = [blk]
-            else:
-                current.append(blk)
-        prev_vec = vec
+    # block embeddings come from the on-disk cache after the first run
+    vectors = embeddings.embed(
+        [blocks.cue_text(i) for i in range(len(blocks))], language
+    )
+    # cosine similarity of each block with the previous one
+    norms = np.linalg.norm(vectors, axis=1)
+    sims = np.einsum("ij,ij->i", vectors[:-1], vectors[1:]) / (
+        norms[:-1] * norms[1:] + 1e-8
+    )
+
+    # segment into topic‐coherent clusters of block indices
+    segments = []
+    current_first = 0
+    min_duration_ms = 60_000
+
+    for i in range(1, len(blocks)):
+        dur = blocks.ends[i] - blocks.starts[current_first]
+        if sims[i - 1] < threshold and dur >= min_duration_ms:
+            segments.append((current_first, i - 1))
+            current_first = i
 
     # append last
-    if current:
-        segments.append(current)
+    if len(blocks):
+        segments.append((current_first, len(blocks) - 1))
 
-    segments = select_top_n_interesting(segments)
+    segments = [
+        {
+            "start": int(blocks.starts[first]),
+            "end": int(blocks.ends[last]),
+            "text": blocks.joined_text(first, last),
+        }
+        for first, last in segments
+    ]
+    return segments
+
+
+def get_interest_segments(
+    srt_file,
+    language="en",
+    threshold: float = 0.7,
+    source_file=None,
+    n=10,
+    update_corpus=False,
+):
+    # update_corpus: count this transcript into the ranking corpus (once
+    # per transcript); scoring alone leaves the corpus as it is
+    segments = split_segments(srt_file, language, threshold)
+    # loudness / energy of the source audio, if any of them is weighted
+    weights = config.get("scoring", {})
+    features = None
+    if source_file and any(
+        weights.get(name) for name in audio_features.FEATURE_NAMES
+    ):
+        features = audio_features.get_features(source_file)
+
+    segments = select_top_n_interesting(
+        segments,
+        n=n,
+        language=language,
+        features=features,
+        key=corpus_key(srt_file) if update_corpus else None,
+    )
 
     return segments
 
-def select_top_n_interesting(segments, n=10):
-    texts = [" ".join(blk["text"] for blk in seg) for seg in segments]
-    vectorizer = TfidfVectorizer(stop_words='english')
-    tfidf = vectorizer.fit_transform(texts)
-    scores = np.asarray(tfidf.sum(axis=1)).ravel()
+
+def update_corpus(srt_file, language="en", threshold: float = 0.7):
+    # counts a finished transcript without ranking it
+    segments = split_segments(srt_file, language, threshold)
+    return ranking.get_corpus_model(language).add_documents(
+        [seg["text"] for seg in segments], corpus_key(srt_file)
+    )
+
+
+def select_top_n_interesting(segments, n=10, language="en", features=None, key=None):
+    # key: count the segments into the corpus under it, see CorpusModel.update
+    texts = [seg["text"] for seg in segments]
+    text_scores = ranking.get_corpus_model(language).score(
+        texts,
+        update=key is not None,
+        key=key,
+        time_limit=ranking.ranking_config.get("time_limit"),
+    )
+    scores = audio_features.combine_scores(
+        text_scores, segments, features, config.get("scoring", {})
+    )
     top_idx = np.argsort(scores)[::-1][:n]
     top_idx_sorted = sorted(top_idx)
     return [segments[i] for i in top_idx_sorted]
\ No newline at end of file
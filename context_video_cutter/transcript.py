@@ -0,0 +1,136 @@
+import io
+from array import array
+
+import numpy as np
+
+SENTENCE_END = (".", "!", "?")
+
+
+def parse_srt_time(value):
+    hours, minutes, rest = value.strip().split(":")
+    seconds, millis = rest.replace(".", ",").split(",")
+    return (int(hours) * 3600 + int(minutes) * 60 + int(seconds)) * 1000 + int(
+        millis
+    )
+
+
+def format_srt_time(ms):
+    hours, ms = divmod(int(ms), 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def iter_srt(srt_file, encoding="utf-8-sig"):
+    # yields (start_ms, end_ms, text) one cue at a time
+    start = end = None
+    lines = []
+    with open(srt_file, "r", encoding=encoding) as f:
+        for raw_line in f:
+            line = raw_line.rstrip("\r\n")
+            if "-->" in line:
+                if start is not None:
+                    yield start, end, "\n".join(lines)
+                start_value, end_value = line.split("-->")
+                start = parse_srt_time(start_value)
+                end = parse_srt_time(end_value.split()[0])
+                lines = []
+            elif not line.strip():
+                if start is not None:
+                    yield start, end, "\n".join(lines)
+                start = None
+                lines = []
+            elif start is not None:
+                lines.append(line)
+    if start is not None:
+        yield start, end, "\n".join(lines)
+
+
+class Transcript:
+    # Cue times are int32 millisecond arrays, cue texts live in one string
+    # where cue i is text[offsets[i]:offsets[i + 1] - 1] (each cue is
+    # followed by a "\n" separator).
+    def __init__(self, starts, ends, text, offsets, sentence_ends):
+        self.starts = starts
+        self.ends = ends
+        self.text = text
+        self.offsets = offsets
+        self.sentence_ends = sentence_ends
+        self._is_sorted = bool(np.all(starts[1:] >= starts[:-1]))
+        self._max_ends = np.maximum.accumulate(ends) if len(ends) else ends
+
+    @classmethod
+    def from_cues(cls, cues):
+        starts = array("i")
+        ends = array("i")
+        offsets = array("q", [0])
+        sentence_ends = array("b")
+        buf = io.StringIO()
+        position = 0
+        for start, end, text in cues:
+            starts.append(start)
+            ends.append(end)
+            sentence_ends.append(text.rstrip().endswith(SENTENCE_END))
+            buf.write(text)
+            buf.write("\n")
+            position += len(text) + 1
+            offsets.append(position)
+        return cls(
+            starts=np.asarray(starts, dtype=np.int32),
+            ends=np.asarray(ends, dtype=np.int32),
+            text=buf.getvalue(),
+            offsets=np.asarray(offsets, dtype=np.int64),
+            sentence_ends=np.asarray(sentence_ends, dtype=bool),
+        )
+
+    @classmethod
+    def from_srt(cls, srt_file):
+        return cls.from_cues(iter_srt(srt_file))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def cue_text(self, index):
+        return self.text[self.offsets[index] : self.offsets[index + 1] - 1]
+
+    def joined_text(self, first, last):
+        # texts of cues first..last (inclusive) as one line
+        return self.text[self.offsets[first] : self.offsets[last + 1] - 1].replace(
+            "\n", " "
+        )
+
+    def sentence_blocks(self):
+        # Merge cues into blocks that end on a sentence-final cue. Trailing
+        # cues without a sentence end are dropped.
+        block_last = np.flatnonzero(self.sentence_ends)
+        block_first = np.concatenate(([0], block_last[:-1] + 1)).astype(np.int64)
+        return Transcript.from_cues(
+            (
+                int(self.starts[first]),
+                int(self.ends[last]),
+                self.joined_text(first, last).strip(),
+            )
+            for first, last in zip(block_first, block_last)
+        )
+
+    def query(self, start_ms, end_ms):
+        # indices of cues overlapping [start_ms, end_ms)
+        if not self._is_sorted:
+            return np.flatnonzero((self.ends > start_ms) & (self.starts < end_ms))
+        lo = np.searchsorted(self._max_ends, start_ms, side="right")
+        hi = np.searchsorted(self.starts, end_ms, side="left")
+        candidates = np.arange(lo, hi)
+        return candidates[self.ends[lo:hi] > start_ms]
+
+    def write_srt(self, srt_file, indices=None, shift_ms=0):
+        if indices is None:
+            indices = range(len(self))
+        with open(srt_file, "w", encoding="utf-8") as f:
+            for number, i in enumerate(indices, 1):
+                start = max(0, int(self.starts[i]) + shift_ms)
+                end = max(0, int(self.ends[i]) + shift_ms)
+                f.write(
+                    f"{number}\n{format_srt_time(start)} --> {format_srt_time(end)}\n"
+                    f"{self.cue_text(i)}\n\n"
+                )
+        return srt_file
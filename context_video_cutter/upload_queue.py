@@ -0,0 +1,290 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+import shutil
+
+import toml
+from filelock import FileLock
+
+from context_video_cutter.shared_paths import local_path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+upload_config = config.get("upload", {})
+
+
+class AccountLedger:
+    # The account JSON is the persistent queue: entries with
+    # is_uploaded == False are pending. Every change is written right away,
+    # atomically and under a file lock.
+    def __init__(self, json_file):
+        self.path = Path(json_file)
+        self.lock = FileLock(self.path.as_posix() + ".lock")
+
+    def _read(self):
+        if not self.path.exists():
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, data):
+        os.makedirs(self.path.parent, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def pending(self):
+        with self.lock:
+            data = self._read()
+        return [item for item in data if item.get("is_uploaded") == False]
+
+    def append(self, entry):
+        # False if the video is already in the ledger
+        with self.lock:
+            data = self._read()
+            if any(item["video"] == entry["video"] for item in data):
+                return False
+            data.append(entry)
+            self._write(data)
+            return True
+
+    def mark_uploaded(self, video_path, uploaded_date, duplicate_of=None):
+        # a duplicate is taken off the queue without being uploaded
+        with self.lock:
+            data = self._read()
+            for item in data:
+                if item["video"] == video_path:
+                    item["is_uploaded"] = True
+                    item["uploaded_date"] = uploaded_date
+                    if duplicate_of:
+                        item["duplicate_of"] = duplicate_of
+            self._write(data)
+
+
+class _ThreadOutputRouter:
+    # Installed once as sys.stdout. Lines printed by threads inside
+    # capture_output go to that thread's sink, everything else to the
+    # original stream, so parallel workers don't swap global stdout.
+    def __init__(self, original):
+        self.original = original
+        self.sinks = {}
+        self.buffers = {}
+
+    def write(self, message):
+        ident = threading.get_ident()
+        # unregistered while the sink runs, in case the sink prints itself
+        sink = self.sinks.pop(ident, None)
+        if sink is None:
+            return self.original.write(message)
+        try:
+            text = self.buffers.get(ident, "") + message
+            *lines, self.buffers[ident] = text.split("\n")
+            for line in lines:
+                if line.strip():
+                    sink(line.strip())
+        finally:
+            self.sinks[ident] = sink
+        return len(message)
+
+    def flush(self):
+        self.original.flush()
+
+
+_router_lock = threading.Lock()
+
+
+@contextmanager
+def capture_output(sink):
+    with _router_lock:
+        if not isinstance(sys.stdout, _ThreadOutputRouter):
+            sys.stdout = _ThreadOutputRouter(sys.stdout)
+        router = sys.stdout
+    ident = threading.get_ident()
+    router.sinks[ident] = sink
+    try:
+        yield
+    finally:
+        router.sinks.pop(ident, None)
+        rest = router.buffers.pop(ident, "")
+        if rest.strip():
+            sink(rest.strip())
+
+
+def first_schedule_time():
+    now = datetime.now() + timedelta(minutes=20)
+    # add 5 min to near number divided by 5
+    extra = (5 - now.minute % 5) % 5
+    return now + timedelta(
+        minutes=extra, seconds=-now.second, microseconds=-now.microsecond
+    )
+
+
+class AccountWorker(threading.Thread):
+    def __init__(
+        self,
+        account_info,
+        upload_func,
+        count,
+        hours_between,
+        log,
+        min_interval=None,
+        retries=None,
+        retry_backoff=None,
+        find_duplicate=None,
+        on_uploaded=None,
+    ):
+        super().__init__(daemon=True)
+        self.account_info = account_info
+        self.upload_func = upload_func
+        # find_duplicate(video, accountname) -> video already posted or None
+        self.find_duplicate = find_duplicate
+        self.on_uploaded = on_uploaded
+        self.count = count
+        self.hours_between = hours_between
+        self.log = log
+        self.min_interval = (
+            min_interval
+            if min_interval is not None
+            else upload_config.get("min_interval", 60)
+        )
+        self.retries = (
+            retries if retries is not None else upload_config.get("retries", 2)
+        )
+        self.retry_backoff = (
+            retry_backoff
+            if retry_backoff is not None
+            else upload_config.get("retry_backoff", 30)
+        )
+        self.ledger = AccountLedger(account_info["json"])
+        self.uploaded = 0
+        self.failed = 0
+        self.duplicates = 0
+
+    def _log(self, message):
+        self.log(f"[{self.account_info['accountname']}] {message}")
+
+    def run(self):
+        schedule = first_schedule_time()
+        last_upload = None
+        for video in self.ledger.pending()[: self.count]:
+            if self._skip_duplicate(video):
+                continue
+            # per-account rate limit
+            if last_upload is not None:
+                wait = last_upload + self.min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            if self._upload(video, schedule):
+                self.uploaded += 1
+                schedule += timedelta(hours=self.hours_between)
+            else:
+                self.failed += 1
+            last_upload = time.monotonic()
+
+    @staticmethod
+    def _video_path(video):
+        # ledger entries name the clip by its shared path
+        return local_path(video["video"])
+
+    def _skip_duplicate(self, video):
+        if self.find_duplicate is None:
+            return False
+        try:
+            duplicate = self.find_duplicate(
+                self._video_path(video), self.account_info["accountname"]
+            )
+        except Exception as e:
+            self._log(f"ERROR: duplicate check {self._video_path(video).name}: {e}")
+            return False
+        if duplicate is None:
+            return False
+        self._log(f"{self._video_path(video).name} duplicates {Path(duplicate).name}")
+        self.ledger.mark_uploaded(video["video"], "", duplicate_of=str(duplicate))
+        self.duplicates += 1
+        return True
+
+    def _notify_uploaded(self, video):
+        # errors stop here: a failing hook must never cause a re-upload
+        if self.on_uploaded is None:
+            return
+        try:
+            self.on_uploaded(self._video_path(video), self.account_info["accountname"])
+        except Exception as e:
+            self._log(f"ERROR: {self._video_path(video).name}: {e}")
+
+    def _upload(self, video, schedule):
+        for attempt in range(self.retries + 1):
+            try:
+                with capture_output(self._log):
+                    result = self.upload_func(
+                        video=self._video_path(video).as_posix(),
+                        description=video["name"],
+                        hashtags=[
+                            tag
+                            for tag in video["hashtags"].split()
+                            if tag.startswith("#")
+                        ],
+                        accountname=self.account_info["accountname"],
+                        schedule=schedule.strftime("%H:%M"),
+                    )
+                self._log(str(result))
+                # committed before the next video starts, so a crash never
+                # causes a re-upload of this one
+                self.ledger.mark_uploaded(
+                    video["video"], schedule.strftime("%Y-%m-%d %H:%M")
+                )
+                self._notify_uploaded(video)
+                return True
+            except Exception as e:
+                self._log(f"ERROR: {self._video_path(video).name}: {e}")
+                if attempt < self.retries:
+                    delay = self.retry_backoff * 2**attempt
+                    self._log(f"Retry in {delay}s")
+                    time.sleep(delay)
+        return False
+
+
+def run_upload_queue(
+    accounts,
+    upload_func,
+    count,
+    hours_between,
+    log=print,
+    find_duplicate=None,
+    on_uploaded=None,
+):
+    # one worker per account, all accounts in parallel
+    workers = [
+        AccountWorker(
+            account_info,
+            upload_func,
+            count,
+            hours_between,
+            log,
+            find_duplicate=find_duplicate,
+            on_uploaded=on_uploaded,
+        )
+        for account_info in accounts
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return {
+        worker.account_info["accountname"]: (worker.uploaded, worker.failed)
+        for worker in workers
+    }
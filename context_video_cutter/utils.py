@@ -1,19 +1,26 @@
 import json
 import os
-import subprocess
+import re
+import socket
 import threading
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 import toml
 from pathlib import Path
 import shutil
 from tkinter import filedialog, messagebox
 import yt_dlp
-from faster_whisper import WhisperModel
+from yt_dlp.utils import download_range_func
+from faster_whisper import BatchedInferencePipeline, WhisperModel
 import srt
 from humanfriendly.terminal import output
+from slugify import slugify
 
+import context_video_cutter.artifact_store as artifact_store
 import context_video_cutter.config_manager as config_manager
+import context_video_cutter.fingerprint_index as fingerprint_index
+import context_video_cutter.manifest as manifest
+import context_video_cutter.process_manager as process_manager
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 config_path = BASE_DIR / "config.toml"
@@ -23,6 +30,46 @@ if not config_path.exists():
     shutil.copy(template_path, config_path)
 
 config = toml.load(config_path)
+daemon_config = config.get("daemon", {})
+
+# beam_size 1 is greedy decoding (only "fast" uses it), batch_size 0
+# disables batched inference, cpu_threads 0 uses every core
+WHISPER_PROFILES = {
+    "fast": {
+        "model": "tiny",
+        "compute_type": "int8",
+        "beam_size": 1,
+        "vad_filter": True,
+        "batch_size": 16,
+        "cpu_threads": 0,
+        "num_workers": 1,
+    },
+    # the default: same model and beam search as before profiles existed
+    "balanced": {
+        "model": "base",
+        "compute_type": "int8",
+        "beam_size": 5,
+        "vad_filter": True,
+        "batch_size": 8,
+        "cpu_threads": 0,
+        "num_workers": 1,
+    },
+    "accurate": {
+        "model": "small",
+        "compute_type": "int8",
+        "beam_size": 5,
+        "vad_filter": True,
+        "batch_size": 0,
+        "cpu_threads": 0,
+        "num_workers": 1,
+    },
+}
+
+# key=value lines written by ffmpeg -progress
+FFMPEG_PROGRESS_LINE = re.compile(r"^\w+=\S*$")
+
+_whisper_models = {}
+_whisper_models_lock = threading.Lock()
 
 
 class YTDLPLogger:
@@ -44,6 +91,9 @@ class YTDLPLogger:
 
 
 def log_message(message, log_box, tk):
+    if log_box is None:
+        print(message)
+        return
     log_box.config(state="normal")
     log_box.insert(tk.END, message + "\n")
     log_box.see(tk.END)
@@ -64,6 +114,7 @@ def select_file(file_type, file_label=None, additional_labels=None):
         if not files_path:
             return files_path
         config_manager.set_source_file_path(files_path[0])
+        config_manager.set_source_url("")
         if file_label:
             file_label.configure(foreground="green", text=Path(files_path[0]).name)
     if file_type == "subs":
@@ -86,16 +137,14 @@ def select_file(file_type, file_label=None, additional_labels=None):
             clip_times = json.load(f)
             f.close()
 
-        clips = []
-        clips_statuses = []
-        for clip_info in clip_times:
-            clips.append(clip_info["filename"])
-            clips_statuses.append("Not started")
-        additional_labels["embedding_clips_label"].config(
-            text="\n".join([Path(v).name for v in clips])
-        )
-        additional_labels["embedding_clips_statuses_label"].config(
-            text="\n".join([v for v in clips_statuses])
+        additional_labels["clip_table"].set_clips(
+            [
+                {
+                    "filename": clip_info["filename"],
+                    "duration": clip_duration(clip_info["start"], clip_info["end"]),
+                }
+                for clip_info in clip_times
+            ]
         )
         if file_label:
             file_label.configure(foreground="green", text=Path(files_path[0]).name)
@@ -103,6 +152,37 @@ def select_file(file_type, file_label=None, additional_labels=None):
     return files_path
 
 
+def get_output_dir(source_path):
+    # a source keeps the dated folder of its first run (found by its
+    # manifest), so re-running it on another day reuses what is there
+    base_name = slugify(Path(source_path).stem)
+    output_dir_base = BASE_DIR / config["paths"]["output_dir_base"]
+    manifests = sorted(
+        output_dir_base.glob(f"*/{base_name}/{manifest.MANIFEST_NAME}"),
+        key=lambda path: path.stat().st_mtime,
+    )
+    if manifests:
+        return manifests[-1].parent
+    output_dir = output_dir_base / datetime.today().strftime("%d.%m.%Y") / base_name
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+def free_disk_space(label, log_box, tk):
+    def worker():
+        label.config(text="Cleaning…", foreground="blue")
+        try:
+            removed = artifact_store.get_store().enforce_quota(
+                log=lambda message: log_message(message, log_box, tk)
+            )
+        except Exception as e:
+            label.config(text=f"Error: {e}", foreground="red")
+            return
+        label.config(text=f"Removed {len(removed)} files", foreground="green")
+
+    threading.Thread(target=worker, daemon=True).start()
+
+
 def open_folder(path):
     os.makedirs(path, exist_ok=True)
     os.startfile(path)
@@ -128,30 +208,126 @@ def download_video(url, log_box, tk, labels=None):
     ).start()
 
 
-def download_and_mark(url, ydl_opts, labels):
+# Range-only workflow: fetch the audio track first, transcribe it and detect
+# moments, then cut_video downloads only the selected ranges of the video.
+def download_audio(url, log_box, tk, labels=None):
+    if not url:
+        messagebox.showerror("Error", "No link!")
+        return
+
+    os.makedirs(BASE_DIR / config["paths"]["sources_dir"], exist_ok=True)
+
+    ydl_opts = {
+        "format": "bestaudio/best",
+        "outtmpl": Path(BASE_DIR / config["paths"]["sources_dir"]).as_posix()
+        + "/%(title)s.audio.%(ext)s",
+        "noplaylist": True,
+        "logger": YTDLPLogger(log_box, tk),
+    }
+
+    threading.Thread(
+        target=download_and_mark,
+        args=(url, ydl_opts, labels, True),
+        daemon=True,
+    ).start()
+
+
+def get_downloaded_path(info):
+    output_path = info.get("filepath")
+    if not output_path:
+        rd = info.get("requested_downloads") or []
+        if rd:
+            output_path = rd[0].get("filepath")
+    return Path(output_path)
+
+
+def download_and_mark(url, ydl_opts, labels, audio_only=False):
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-
-        output_path = info.get("filepath")
-        if not output_path:
-            rd = info.get("requested_downloads") or []
-            if rd:
-                output_path = rd[0].get("filepath")
-        output_path = Path(output_path)
+        # a video already downloaded, under this id or with the same
+        # content under another title, is reused instead of fetched again
+        index = fingerprint_index.get_index()
+        with artifact_store.downloading(), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            key = fingerprint_index.video_key(info, audio_only)
+            output_path = index.find_source(key=key)
+            reused = output_path is not None
+            if not reused:
+                info = ydl.process_ie_result(info, download=True)
+                downloaded_path = get_downloaded_path(info)
+                output_path = index.register_source(downloaded_path, key)
+                reused = output_path != downloaded_path
+
         config_manager.set_source_file_path(output_path.as_posix())
-        labels["downloaded_file_label"].config(text="Ready", style="Green.TLabel")
+        config_manager.set_source_url(url if audio_only else "")
+        status_text = "Ready (audio only)" if audio_only else "Ready"
+        if reused:
+            status_text = "Already downloaded"
+        labels["downloaded_file_label"].config(text=status_text, style="Green.TLabel")
         labels["selected_file_label"].config(
             text=output_path.name, style="Green.TLabel"
         )
+        artifact_store.touch(output_path)
+        artifact_store.get_store().enforce_quota()
     except Exception as e:
         err_text = str(e)
         messagebox.showerror("Ошибка", str(err_text))
 
 
-def make_wav_from_video(input_video_path, output_audio_path, log_box, tk):
-    cmd = [
-        "ffmpeg",
+def download_video_section(url, start, end, output_stem, log_box, tk):
+    # pad the range so the keyframe before the clip start is inside the section
+    padding = config.get("download", {}).get("keyframe_padding", 5)
+    section_start = max(0.0, start - padding)
+    section_end = end + padding
+
+    ydl_opts = {
+        "format": "bestvideo[height<=720]+bestaudio/best[height<=720]",
+        "outtmpl": Path(output_stem).as_posix() + ".%(ext)s",
+        "noplaylist": True,
+        "overwrites": True,
+        "download_ranges": download_range_func(None, [(section_start, section_end)]),
+        "logger": YTDLPLogger(log_box, tk),
+    }
+    with artifact_store.downloading(), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+
+    return get_downloaded_path(info), section_start
+
+
+def parse_timecode(value):
+    hours, minutes, seconds = value.strip().split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def format_timecode(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+def get_timecode_lines(timecodes_textbox, tk):
+    text_box_value = timecodes_textbox.get("1.0", tk.END).strip()
+    if text_box_value:
+        return text_box_value.splitlines()
+    return config_manager.get_timecodes()
+
+
+def make_wav_from_video(
+    input_video_path,
+    output_audio_path,
+    log_box,
+    tk,
+    start=None,
+    end=None,
+    group="transcribe",
+):
+    cmd = ["ffmpeg", "-y"]
+    if start is not None:
+        cmd += ["-ss", format_timecode(start)]
+    if end is not None:
+        cmd += ["-to", format_timecode(end)]
+    cmd += [
         "-i",
         input_video_path,
         "-ar",
@@ -163,36 +339,163 @@ def make_wav_from_video(input_video_path, output_audio_path, log_box, tk):
         output_audio_path,
     ]
 
-    process = subprocess.Popen(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding="utf-8"
+    run_tool(
+        cmd,
+        log_box,
+        tk,
+        group=group,
+        resources=("cpu", "disk"),
+        outputs=[output_audio_path],
     )
-    for output_line in process.stdout:
-        log_message(message=output_line.strip(), log_box=log_box, tk=tk)
-    process.wait()
     return output_audio_path
 
 
-def make_srt_file_from_audio(input_file_path, output_file_path, log_box, tk):
-    model = WhisperModel("base", device="cpu", compute_type="int8")
-    segments, info = model.transcribe(
-        audio=input_file_path,
-        language=config_manager.get_language(),
-        beam_size=5,
-        word_timestamps=False,
+def run_tool(cmd, log_box, tk, on_progress=None, **kwargs):
+    # every external tool goes through the shared process manager; with
+    # on_progress, ffmpeg reports its position (seconds) there instead of
+    # writing progress lines into the log
+    if on_progress:
+        cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+
+    def on_output(line):
+        if on_progress and FFMPEG_PROGRESS_LINE.match(line):
+            key, value = line.split("=", 1)
+            if key == "out_time_us" and value.isdigit():
+                on_progress(int(value) / 1_000_000)
+            return
+        log_message(message=line, log_box=log_box, tk=tk)
+
+    return process_manager.get_manager().run(cmd, on_output=on_output, **kwargs)
+
+
+def clip_duration(start, end):
+    # seconds between two timecodes, None if either is malformed
+    try:
+        return parse_timecode(end) - parse_timecode(start)
+    except ValueError:
+        return None
+
+
+def get_whisper_profile(name=None):
+    name = name or config_manager.get_whisper_profile()
+    profile = dict(WHISPER_PROFILES.get(name, WHISPER_PROFILES["balanced"]))
+    profile.update(config.get("whisper", {}).get("profiles", {}).get(name, {}))
+    return profile
+
+
+def get_whisper_model(profile):
+    cpu_threads = profile["cpu_threads"] or os.cpu_count() or 0
+    key = (
+        profile["model"],
+        profile["compute_type"],
+        cpu_threads,
+        profile["num_workers"],
     )
+    with _whisper_models_lock:
+        if key not in _whisper_models:
+            _whisper_models[key] = WhisperModel(
+                profile["model"],
+                device="cpu",
+                compute_type=profile["compute_type"],
+                cpu_threads=cpu_threads,
+                num_workers=profile["num_workers"],
+            )
+        return _whisper_models[key]
+
+
+def run_whisper(input_file_path, profile, language=None):
+    model = get_whisper_model(profile)
+    options = {
+        "audio": input_file_path,
+        "language": language or config_manager.get_language(),
+        "beam_size": profile["beam_size"],
+        "vad_filter": profile["vad_filter"],
+        "word_timestamps": False,
+    }
+    if profile["batch_size"]:
+        return BatchedInferencePipeline(model=model).transcribe(
+            batch_size=profile["batch_size"], **options
+        )
+    return model.transcribe(**options)
+
+
+def transcribe_audio(input_file_path, log_box, tk, offset=0.0, profile=None):
+    # offset shifts timestamps of a cut-out range back to source time
+    profile = get_whisper_profile(profile)
     subtitles = []
-    for i, segment in enumerate(segments):
-        start = timedelta(seconds=segment.start)
-        end = timedelta(seconds=segment.end)
-        content = segment.text.strip()
+
+    def add_segment(segment_start, segment_end, text):
+        start = timedelta(seconds=offset + segment_start)
+        end = timedelta(seconds=offset + segment_end)
+        content = text.strip()
 
         log_message(message=f"[{start} -> {end}] {content}", log_box=log_box, tk=tk)
 
-        subtitle = srt.Subtitle(index=i + 1, start=start, end=end, content=content)
-        subtitles.append(subtitle)
+        subtitles.append(srt.Subtitle(index=0, start=start, end=end, content=content))
+
+    def on_event(event):
+        if event["event"] == "segment":
+            add_segment(event["start"], event["end"], event["text"])
+        else:
+            log_message(message=event["message"], log_box=log_box, tk=tk)
+
+    # the worker daemon already has the model loaded; segments stream back
+    # while it transcribes
+    served = daemon_request(
+        {
+            "op": "transcribe",
+            "input": Path(input_file_path).resolve().as_posix(),
+            "profile": profile,
+            "language": config_manager.get_language(),
+        },
+        on_event=on_event,
+    )
+    if served is None:
+        segments, info = run_whisper(input_file_path, profile)
+        for segment in segments:
+            add_segment(segment.start, segment.end, segment.text)
+
+    return subtitles
+
 
+def daemon_request(request, on_event=None):
+    # result of a job run by the worker daemon, or None when it is disabled
+    # or not running, in which case the caller does the work itself
+    if not daemon_config.get("enabled", False):
+        return None
+    try:
+        connection = socket.create_connection(
+            (
+                daemon_config.get("host", "127.0.0.1"),
+                daemon_config.get("port", 8765),
+            ),
+            timeout=daemon_config.get("connect_timeout", 0.5),
+        )
+    except OSError:
+        return None
+    connection.settimeout(None)
+    with connection, connection.makefile("rwb") as stream:
+        stream.write((json.dumps(request) + "\n").encode("utf-8"))
+        stream.flush()
+        for raw_line in stream:
+            event = json.loads(raw_line)
+            if event["event"] == "done":
+                return event["result"]
+            if event["event"] == "error":
+                raise RuntimeError(f"worker daemon: {event['message']}")
+            if on_event:
+                on_event(event)
+    raise RuntimeError("worker daemon closed the connection")
+
+
+def write_srt_file(subtitles, output_file_path):
     with open(output_file_path, "w", encoding="utf-8") as f:
         f.write(srt.compose(subtitles))
         f.close()
 
     return output_file_path
+
+
+def make_srt_file_from_audio(input_file_path, output_file_path, log_box, tk):
+    subtitles = transcribe_audio(input_file_path, log_box, tk)
+    return write_srt_file(subtitles, output_file_path)
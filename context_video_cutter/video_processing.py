@@ -1,18 +1,21 @@
 import json
 import os
-import subprocess
-from datetime import datetime
 from pathlib import Path
 import shutil
 from tkinter import messagebox
 
-import pysrt
 import toml
-from pysrt import SubRipTime, SubRipFile
-from slugify import slugify
 
+import context_video_cutter.artifact_store as artifact_store
 import context_video_cutter.config_manager as config_manager
+import context_video_cutter.fingerprint_index as fingerprint_index
+import context_video_cutter.loudness as loudness
+import context_video_cutter.process_manager as process_manager
 import context_video_cutter.utils as utils
+from context_video_cutter.manifest import Manifest
+from context_video_cutter.shared_paths import local_path, shared_path
+from context_video_cutter.transcript import Transcript
+from context_video_cutter.upload_queue import AccountLedger
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 config_path = BASE_DIR / "config.toml"
@@ -22,72 +25,219 @@ if not config_path.exists():
     shutil.copy(template_path, config_path)
 
 config = toml.load(config_path)
+subtitles_config = config.get("subtitles", {})
+loudness_config = config.get("loudness", {})
 
 
 def cut_video(labels, log_box, tk):
     if not config_manager.get_source_file_path():
         messagebox.showerror("Error", "Select video file.")
         return
+    # a second click while clips are being cut must not start another set
+    manager = process_manager.get_manager()
+    if not manager.start_group("cut"):
+        messagebox.showwarning("Error", "Clips are already being cut.")
+        return
+    try:
+        _cut_video(labels, log_box, tk)
+    finally:
+        manager.finish_group("cut")
+
+
+def cancel_cut_video():
+    process_manager.get_manager().cancel_group("cut")
+
+
+def cut_clip(
+    input_path,
+    start,
+    end,
+    clip_path,
+    log_box,
+    tk,
+    group="cut",
+    on_progress=None,
+    gain=None,
+):
+    # stream copy; with a loudness gain only the audio is re-encoded
+    cmd = ["ffmpeg", "-y", "-ss", start, "-to", end, "-i", input_path]
+    if gain is None:
+        cmd += ["-c", "copy"]
+    else:
+        cmd += [
+            "-c:v",
+            "copy",
+            "-af",
+            loudness.gain_filter(gain),
+            "-c:a",
+            loudness.audio_encoder(clip_path),
+            "-b:a",
+            loudness_config.get("audio_bitrate", "192k"),
+        ]
+    cmd.append(Path(clip_path).as_posix())
+    return utils.run_tool(
+        cmd,
+        log_box,
+        tk,
+        group=group,
+        resources=("disk",),
+        outputs=[clip_path],
+        on_progress=on_progress,
+    )
+
+
+def _line_duration(line):
+    start, _, end = line.strip().partition(" - ")
+    return utils.clip_duration(start, end)
+
+
+def _cut_video(labels, log_box, tk):
+    manager = process_manager.get_manager()
     video = Path(config_manager.get_source_file_path())
     labels["clip_cutting_label"].config(text="Status: In progress", style="Blue.TLabel")
-    base_name = slugify(Path(video).stem)
-    current_output_dir = (
-        BASE_DIR
-        / config["paths"]["output_dir_base"]
-        / datetime.today().strftime("%d.%m.%Y")
-        / base_name
-    )
+    current_output_dir = utils.get_output_dir(video)
+    manifest = Manifest(current_output_dir)
+    artifact_store.touch(video)
 
-    clips = []
-    clips_statuses = []
-    os.makedirs(current_output_dir, exist_ok=True)
     json_info = []
 
-    text_box_value = labels["timecodes_textbox"].get("1.0", tk.END)
-    if text_box_value:
-        lines = text_box_value.strip().splitlines()
-    else:
-        lines = config_manager.get_timecodes()
+    lines = utils.get_timecode_lines(labels["timecodes_textbox"], tk)
+    table = labels["clip_table"]
+    table.set_clips(
+        [
+            {"filename": f"clip_{i:02d}", "duration": _line_duration(line)}
+            for i, line in enumerate(lines, 1)
+        ]
+    )
+    # source is audio only: fetch just the clip ranges of the video
+    source_url = config_manager.get_source_url()
+    index = fingerprint_index.get_index()
+    source_hash = fingerprint_index.source_hash(video)
     for i, line in enumerate(lines, 1):
+        if manager.is_cancelled("cut"):
+            break
+        section_path = None
         try:
             start, end = line.strip().split(" - ")
-            clip_path = current_output_dir / f"clip_{i:02d}{video.suffix}"
+            duration = utils.clip_duration(start, end)
+            clip_name = f"clip_{i:02d}"
+            clip_inputs = [] if source_url else [video]
+            clip_params = {"start": start, "end": end, "source_url": source_url}
+            loudness_settings = loudness.clip_settings()
+            if loudness_settings:
+                clip_params["loudness"] = loudness_settings
+            if manifest.is_fresh(clip_name, clip_inputs, clip_params):
+                clip_path = manifest.get_path(clip_name)
+                utils.log_message(
+                    f"{clip_path.name} is up to date, skipping", log_box, tk
+                )
+                status = "Up to date"
+            else:
+                # a clip mostly covering the range of one cut for this source
+                # elsewhere would be posted twice: clips.json points to that
+                # one instead
+                duplicate = index.overlapping_clip(
+                    source_hash,
+                    utils.parse_timecode(start),
+                    utils.parse_timecode(end),
+                    exclude_dir=current_output_dir,
+                )
+                if duplicate:
+                    clip_path, other_start, other_end = duplicate
+                    utils.log_message(
+                        f"{clip_name} overlaps {clip_path.as_posix()}, reusing it",
+                        log_box,
+                        tk,
+                    )
+                    table.update(
+                        i - 1,
+                        status="Duplicate",
+                        progress=100,
+                        size=clip_path.stat().st_size,
+                    )
+                    json_info.append(
+                        {
+                            "filename": shared_path(clip_path),
+                            "start": utils.format_timecode(other_start),
+                            "end": utils.format_timecode(other_end),
+                            "duplicate": True,
+                        }
+                    )
+                    continue
+                table.update(i - 1, status="Cutting", progress=0)
+                # measured once per source, so the cut itself stays one pass
+                gain = loudness.clip_gain(
+                    video,
+                    utils.parse_timecode(start),
+                    utils.parse_timecode(end),
+                    log_box,
+                    tk,
+                    group="cut",
+                )
+                input_path = video
+                cut_start, cut_end = start, end
+                if source_url:
+                    section_path, section_start = utils.download_video_section(
+                        url=source_url,
+                        start=utils.parse_timecode(start),
+                        end=utils.parse_timecode(end),
+                        output_stem=current_output_dir / f"section_{i:02d}",
+                        log_box=log_box,
+                        tk=tk,
+                    )
+                    input_path = section_path
+                    cut_start = utils.format_timecode(
+                        utils.parse_timecode(start) - section_start
+                    )
+                    cut_end = utils.format_timecode(
+                        utils.parse_timecode(end) - section_start
+                    )
+                clip_path = current_output_dir / f"{clip_name}{Path(input_path).suffix}"
+                return_code = cut_clip(
+                    input_path,
+                    cut_start,
+                    cut_end,
+                    clip_path,
+                    log_box,
+                    tk,
+                    on_progress=lambda seconds: table.update(
+                        i - 1, progress=seconds * 100 / duration if duration else None
+                    ),
+                    gain=gain,
+                )
+                if return_code != 0:
+                    table.update(i - 1, status="Error")
+                    continue
+                manifest.record(clip_name, clip_path, clip_inputs, clip_params)
+                try:
+                    index.add_clip(
+                        clip_path,
+                        source_hash,
+                        utils.parse_timecode(start),
+                        utils.parse_timecode(end),
+                        group="cut",
+                    )
+                except RuntimeError as e:
+                    utils.log_message(f"ERROR: {e}", log_box, tk)
+                status = "Cut"
 
-            clips.append(clip_path)
-            clips_statuses.append("Not started")
-
-            json_info.append(
-                {"filename": clip_path.as_posix(), "start": start, "end": end}
+            artifact_store.touch(clip_path)
+            table.update(
+                i - 1, status=status, progress=100, size=clip_path.stat().st_size
             )
 
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-ss",
-                start,
-                "-to",
-                end,
-                "-i",
-                video,
-                "-c",
-                "copy",
-                clip_path.as_posix(),
-            ]
-            process = subprocess.Popen(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding="utf-8"
+            json_info.append(
+                {"filename": shared_path(clip_path), "start": start, "end": end}
             )
-            for output_line in process.stdout:
-                utils.log_message(message=output_line.strip(), log_box=log_box, tk=tk)
-            process.wait()
+        except process_manager.JobCancelled:
+            table.update(i - 1, status="Cancelled")
+            break
         except Exception as e:
+            table.update(i - 1, status="Error")
             messagebox.showwarning("Error", f"Wrong string format: {line}\n{e}")
-
-    labels["embedding_clips_label"].config(
-        text="\n".join([Path(v).name for v in clips])
-    )
-    labels["embedding_clips_statuses_label"].config(
-        text="\n".join([v for v in clips_statuses])
-    )
+        finally:
+            if section_path and section_path.exists():
+                os.remove(section_path)
 
     clips_json_path = current_output_dir / "clips.json"
     with open(clips_json_path, "w", encoding="utf-8") as f:
@@ -96,12 +246,99 @@ def cut_video(labels, log_box, tk):
     config_manager.set_clips_json_path(clips_json_path)
     labels["clips_json"].config(text=clips_json_path.name)
 
-    labels["clip_cutting_label"].config(text="Status: Ready", style="Green.TLabel")
+    if manager.is_cancelled("cut"):
+        labels["clip_cutting_label"].config(text="Status: Cancelled", foreground="red")
+    else:
+        labels["clip_cutting_label"].config(text="Status: Ready", style="Green.TLabel")
+
+
+def burn_subtitles(
+    clip_path, srt_path, output_path, style, log_box, tk, on_progress=None
+):
+    # run from the clip folder: the subtitles filter gets bare file names,
+    # so drive letters and backslashes need no escaping
+    subtitles_filter = f"subtitles='{srt_path.name}'"
+    if style:
+        subtitles_filter += f":force_style='{style}'"
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        clip_path.name,
+        "-vf",
+        subtitles_filter,
+        "-c:a",
+        "copy",
+        output_path.name,
+    ]
+    return utils.run_tool(
+        cmd,
+        log_box,
+        tk,
+        group="burn",
+        outputs=[output_path],
+        cwd=clip_path.parent.as_posix(),
+        on_progress=on_progress,
+    )
+
+
+def subtitle_clip(
+    clip_file_path,
+    subs,
+    subs_path,
+    start,
+    end,
+    manifest,
+    log_box,
+    tk,
+    on_burn=None,
+    on_progress=None,
+):
+    # only clips whose range or transcript changed get a new .srt, and
+    # only clips whose video, .srt or style changed are burned again;
+    # returns the file to upload, None if burning failed
+    temp_srt_path = clip_file_path.with_suffix(".srt")
+    srt_params = {"start": start, "end": end}
+    if not manifest.is_fresh(temp_srt_path.name, [subs_path], srt_params):
+        subs.write_srt(temp_srt_path, subs.query(start, end), shift_ms=-start)
+        manifest.record(temp_srt_path.name, temp_srt_path, [subs_path], srt_params)
+
+    if not subtitles_config.get("burn", False):
+        return clip_file_path
+    video_path = clip_file_path.with_stem(f"embed_{clip_file_path.stem}")
+    burn_inputs = [clip_file_path, temp_srt_path]
+    burn_params = {"style": subtitles_config.get("style", "")}
+    if not manifest.is_fresh(video_path.stem, burn_inputs, burn_params):
+        if on_burn:
+            on_burn()
+        return_code = burn_subtitles(
+            clip_file_path,
+            temp_srt_path,
+            video_path,
+            burn_params["style"],
+            log_box,
+            tk,
+            on_progress=on_progress,
+        )
+        if return_code != 0:
+            return None
+        manifest.record(video_path.stem, video_path, burn_inputs, burn_params)
+    return video_path
+
+
+def queue_upload(json_file, video_path):
+    # locked, atomic append: an upload may be updating this ledger;
+    # a clip already queued by an earlier run is not added twice
+    return AccountLedger(json_file).append({
+        "video": shared_path(video_path),
+        "name": "",
+        "hashtags": "",
+        "is_uploaded": False,
+        "uploaded_date": "",
+    })
 
 
 def hardcode_subs(labels, log_box, tk):
-    labels["embedding_clips_label"].config(style="Blue.TLabel")
-    labels["embedding_clips_statuses_label"].config(style="Blue.TLabel")
     if not config_manager.get_clips_json_path():
         messagebox.showerror("Error", "Select json file")
         return
@@ -110,89 +347,69 @@ def hardcode_subs(labels, log_box, tk):
         return
     json_path = Path(config_manager.get_clips_json_path())
     subs_path = Path(config_manager.get_subs_file_path())
+    manifest = Manifest(json_path.parent)
 
     with open(json_path, "r", encoding="utf-8") as f:
         clip_times = json.load(f)
         f.close()
-    subs = pysrt.open(subs_path)
+    subs = Transcript.from_srt(subs_path)
 
-    clips_statuses = []
-    for clip_info in clip_times:
-        clips_statuses.append("Not started")
+    table = labels["clip_table"]
+    table.set_clips(
+        [
+            {
+                "filename": clip_info["filename"],
+                "duration": utils.clip_duration(clip_info["start"], clip_info["end"]),
+            }
+            for clip_info in clip_times
+        ]
+    )
 
     account_info = config_manager.get_account_config()
     json_file = account_info["json"]
 
     for index, clip_info in enumerate(clip_times):
-        clips_statuses[index] = "Processing"
-        labels["embedding_clips_statuses_label"].config(
-            text="\n".join([v for v in clips_statuses])
-        )
+        table.update(index, status="Subtitles", progress=0)
 
-        clip_file_path = Path(clip_info["filename"])
+        # another run's clip: subtitled, burned and queued by that run
+        if clip_info.get("duplicate"):
+            table.update(index, status="Duplicate")
+            continue
+        clip_file_path = local_path(clip_info["filename"])
+        # clips.json may list clips that are not cut (yet)
+        if not clip_file_path.exists():
+            table.update(index, status="Missing")
+            continue
 
-        start = SubRipTime.from_string(clip_info["start"])
-        end = SubRipTime.from_string(clip_info["end"])
+        start = int(round(utils.parse_timecode(clip_info["start"]) * 1000))
+        end = int(round(utils.parse_timecode(clip_info["end"]) * 1000))
+        duration = (end - start) / 1000
 
-        clip_items = [s for s in subs if not (s.end <= start or s.start >= end)]
-        clip = SubRipFile(items=clip_items)
-        clip.shift(
-            hours=-start.hours,
-            minutes=-start.minutes,
-            seconds=-start.seconds,
-            milliseconds=-start.milliseconds,
-        )
-        clip.clean_indexes()
-        temp_srt_path = clip_file_path.with_suffix(".srt")
-        clip.save(temp_srt_path, encoding="utf-8")
-
-        with open(json_file, 'r', encoding='utf-8') as f:
-            account_json_file_data = json.load(f)
-            f.close()
-
-        account_json_file_data.append({
-            "video": clip_info["filename"],
-            "name": "",
-            "hashtags": "",
-            "is_uploaded": False,
-            "uploaded_date": "",
-        })
-
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(account_json_file_data, f, ensure_ascii=False, indent=4)
-            f.close()
-
-        # tmp_embed_video = Path(clip_file_path.as_posix()).with_stem(
-        #     f"embed_clip_{index + 1}"
-        # )
-        #
-        # cmd = [
-        #     "ffmpeg",
-        #     "-y",
-        #     "-i",
-        #     clip_file_path.as_posix(),
-        #     "-vf",
-        #     f"subtitles='{temp_srt_path.name}'",
-        #     "-c:a",
-        #     "copy",
-        #     tmp_embed_video.as_posix(),
-        # ]
-        #
-        # process = subprocess.Popen(
-        #     cmd,
-        #     stdout=subprocess.PIPE,
-        #     stderr=subprocess.STDOUT,
-        #     encoding="utf-8",
-        #     cwd=Path(clip_file_path).parent.as_posix(),
-        # )
-        # for line in process.stdout:
-        #     utils.log_message(message=line.strip(), log_box=log_box, tk=tk)
-        # process.wait()
-
-        clips_statuses[index] = "Ready"
-        labels["embedding_clips_statuses_label"].config(
-            text="\n".join([v for v in clips_statuses])
-        )
+        try:
+            video_path = subtitle_clip(
+                clip_file_path,
+                subs,
+                subs_path,
+                start,
+                end,
+                manifest,
+                log_box,
+                tk,
+                on_burn=lambda: table.update(index, status="Burning"),
+                on_progress=lambda seconds: table.update(
+                    index, progress=seconds * 100 / duration if duration else None
+                ),
+            )
+        except Exception as e:
+            utils.log_message(f"ERROR: {clip_file_path.name}: {e}", log_box, tk)
+            video_path = None
+        if video_path is None or not video_path.exists():
+            table.update(index, status="Error")
+            continue
 
-    labels["embedding_clips_label"].config(style="Green.TLabel")
-    labels["embedding_clips_statuses_label"].config(style="Green.TLabel")
+        artifact_store.touch(clip_file_path, video_path)
+        queue_upload(json_file, video_path)
+
+        table.update(
+            index, status="Ready", progress=100, size=video_path.stat().st_size
+        )
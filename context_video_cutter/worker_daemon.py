@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import socketserver
+import time
+from pathlib import Path
+import shutil
+
+import toml
+
+import context_video_cutter.embeddings as embeddings
+import context_video_cutter.ranking as ranking
+import context_video_cutter.subtitle_processing as subtitle_processing
+import context_video_cutter.utils as utils
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+config_path = BASE_DIR / "config.toml"
+template_path = BASE_DIR / "config.example.toml"
+if not config_path.exists():
+    print("⚠ config.toml not found — creating from template.")
+    shutil.copy(template_path, config_path)
+
+config = toml.load(config_path)
+daemon_config = config.get("daemon", {})
+
+# Usage: python -m context_video_cutter.worker_daemon [--host H] [--port P]
+# Keeps the Whisper and spaCy models loaded and runs transcription and
+# moment detection for any number of GUI or script clients. Protocol: one
+# JSON request per line; the reply is a stream of JSON events per line,
+# ending with {"event": "done", "result": ...} or {"event": "error", ...}.
+
+
+def transcribe(request, send):
+    segments, info = utils.run_whisper(
+        request["input"], request["profile"], language=request.get("language")
+    )
+    count = 0
+    for segment in segments:
+        send(
+            {
+                "event": "segment",
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+            }
+        )
+        count += 1
+    return {"segments": count}
+
+
+def detect(request, send):
+    send({"event": "log", "message": f"Detecting moments in {request['srt']}"})
+    return subtitle_processing.get_interest_segments(
+        request["srt"],
+        request.get("language", "en"),
+        request.get("threshold", 0.7),
+        source_file=request.get("source_file"),
+        update_corpus=request.get("update_corpus", False),
+    )
+
+
+def ping(request, send):
+    return {"pid": os.getpid()}
+
+
+OPERATIONS = {"transcribe": transcribe, "detect": detect, "ping": ping}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw_line in self.rfile:
+            try:
+                request = json.loads(raw_line)
+                result = OPERATIONS[request["op"]](request, self.send)
+                self.send({"event": "done", "result": result})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as e:
+                self.send({"event": "error", "message": f"{type(e).__name__}: {e}"})
+
+    def send(self, event):
+        self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def preload():
+    for name in daemon_config.get("profiles", ["balanced"]):
+        started = time.perf_counter()
+        utils.get_whisper_model(utils.get_whisper_profile(name))
+        print(f"Whisper profile {name}: {time.perf_counter() - started:.1f}s")
+    for language in daemon_config.get("languages", ["en", "ru"]):
+        started = time.perf_counter()
+        embeddings.get_backend(language)
+        ranking.get_corpus_model(language)
+        print(f"Language models {language}: {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=daemon_config.get("host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=daemon_config.get("port", 8765))
+    args = parser.parse_args()
+
+    preload()
+    with WorkerServer((args.host, args.port), RequestHandler) as server:
+        print(f"Listening on {args.host}:{args.port}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()